@@ -1,5 +1,4 @@
 import os
-import sys
 
 # Base directory of the project
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -18,13 +17,30 @@ OUTPUT_VIDEOS_DIR = os.getenv('COW_OUTPUT_DIR', os.path.join(BASE_DIR, 'output_c
 # Default: 'single_cow_videos' folder in project root
 SINGLE_COW_VIDEOS_DIR = os.getenv('COW_SINGLE_DIR', os.path.join(BASE_DIR, 'single_cow_videos'))
 
+# Scanner verdicts are cached in this file (keyed by path, mtime, size and scan settings).
+# It lives outside OUTPUT_VIDEOS_DIR so it neither counts as existing output nor is deleted by --clean.
+SCAN_CACHE_FILE = os.getenv('COW_SCAN_CACHE', os.path.join(BASE_DIR, '.scan_cache.json'))
+
+# Number of sampled frames the scanner sends to the detector in a single call
+SCAN_BATCH_SIZE = 16
+# The scanner only runs detection on every N-th frame (15 frames ~ 0.5s at 30 fps)
+SCAN_FRAME_STRIDE = 15
+# A video is accepted as single-cow once this many consecutive sampled frames show exactly one cow
+# (60 samples ~ 30s at the default stride). None scans until the end of the video.
+SINGLE_COW_CONFIDENCE_FRAMES = 60
+# Upper bound on the number of frames the scanner reads per video. None means no limit.
+SINGLE_COW_MAX_SCAN_FRAMES = None
+
 # Smoothing settings
 SMOOTHING_ALPHA = 0.2  # Lower = smoother but more lag (0.0 to 1.0)
+SMOOTHING_BACKEND = 'numpy'  # Options: 'numpy', 'numba' (JIT-compiled EMA kernel, requires numba)
 
 # Model settings
 # YOLO model to use (yolov8n.pt, yolov8s.pt, etc. will be downloaded automatically if not present)
 #YOLO_MODEL_NAME = 'yolov8n.pt'
 YOLO_MODEL_NAME = 'yolov8m-seg.pt'
+USE_FP16 = True  # Run inference in half precision on GPU (no effect on CPU)
+DETECTOR_WARMUP = True  # Run one dummy inference at startup to move first-call latency out of the pipeline
 
 # Processing settings
 BORDER_MARGIN = 5
@@ -36,66 +52,193 @@ BACKGROUND_COLOR = (0, 0, 0)  # Black background to minimize distortion visibili
 MASK_METHOD = 'soft'  # Options: 'binary', 'soft'
 MASK_BLUR_KERNEL_SIZE = (15, 15)  # Kernel size for Gaussian blur (must be odd numbers)
 MASK_DILATION_ITERATIONS = 2      # Number of iterations to dilate the mask before blurring
+MASK_BLEND_BACKEND = 'opencv'     # Options: 'opencv', 'numba' (parallel JIT kernel, requires numba)
 
-# File extension for input and output
+# File extensions: VIDEO_EXT is used for output videos, VIDEO_EXTS lists the input extensions picked up
+# from INPUT_VIDEOS_DIR (lowercase). Inputs default to the output extension; add others (e.g. '.mov') as needed.
 VIDEO_EXT = '.mp4'
+VIDEO_EXTS = {VIDEO_EXT}
+
+# Frames larger than this (width, height) are downscaled, aspect ratio preserved, before detection.
+# Boxes and masks are mapped back, so crops still come from the full-resolution frame. None disables.
+DETECT_RESOLUTION = (1280, 720)
+
+# Number of consecutive frames sent to the detector/tracker in a single call during processing
+PROCESS_BATCH_SIZE = 8
+
+# Decode videos on the GPU with NVDEC (needs OpenCV built with CUDA video support); falls back to CPU decoding
+USE_NVDEC = False
+
+# Number of decoded frames buffered ahead of detection by the reader thread
+FRAME_QUEUE_SIZE = 8
+
+# Number of detected batches buffered ahead of the crop/mask/write thread
+POSTPROCESS_QUEUE_SIZE = 2
+
+# Number of frames buffered per track ahead of its background encoder thread
+WRITER_QUEUE_SIZE = 8
+# Frames are handed to the encoder thread in batches of this many (one queue operation per batch)
+WRITER_BATCH = 16
+# Frames queued for encoding across all tracks at once; write_frame blocks when encoders fall behind.
+# Not counted: each track's partial batch (under WRITER_BATCH frames) and the prebuffer
+# (WRITER_MAX_PREBUFFER_FRAMES), so writer memory is about
+# WRITER_MAX_INFLIGHT + WRITER_MAX_PREBUFFER_FRAMES + tracks * WRITER_BATCH frames. Must be at least WRITER_BATCH.
+WRITER_MAX_INFLIGHT = 32
+# A track's first frames are kept in memory and only encoded once the track reaches MIN_TRACK_DURATION_SEC,
+# so tracks that end up too short are never encoded. This caps the frames held this way across all tracks;
+# beyond it the oldest waiting track starts encoding early (and is still deleted if it ends up too short).
+WRITER_MAX_PREBUFFER_FRAMES = 150
+
+# Video encoder for output tracks:
+#   'mp4v'  - OpenCV's built-in MPEG-4 writer (CPU, no extra dependencies)
+#   'nvenc' - H.264 on NVIDIA GPUs, 'qsv' - H.264 on Intel Quick Sync, 'x264' - H.264 on CPU (libx264)
+# All but 'mp4v' pipe raw frames to an ffmpeg process (FFMPEG_BINARY must be on PATH or an absolute path)
+ENCODER = 'mp4v'
+FFMPEG_BINARY = 'ffmpeg'
 
 # Output configurations
 OUTPUT_RESOLUTION = (640, 640)  # Width, Height
 MIN_TRACK_DURATION_SEC = 4.0
 CROP_PADDING = 30  # Extra pixels around the detection box to prevent clipping (e.g. hooves, tails)
 
+# Parallelism settings
+# Number of worker processes for scanning/processing videos. Each worker loads its own YOLO model,
+# so keep this at 1 unless there is enough CPU/GPU memory for several models.
+def _env_int(name: str, default: int):
+    """
+    Reads an integer from environment variable `name`.
+    An unparsable value is kept as the raw string so that iter_config_errors() reports it
+    instead of importing settings failing.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+NUM_WORKERS = _env_int('COW_WORKERS', 1)
+
 # Logging settings
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 LOG_FILE = os.path.join(LOG_DIR, 'cow_extraction.log')
 LOG_LEVEL = os.getenv('COW_LOG_LEVEL', 'INFO')  # DEBUG, INFO, WARNING, ERROR, CRITICAL
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+LOG_BUFFER_CAPACITY = 1024  # Number of log records buffered before they are written to the log file
 
-# Create output and log directories if they don't exist
-os.makedirs(OUTPUT_VIDEOS_DIR, exist_ok=True)
-os.makedirs(LOG_DIR, exist_ok=True)
+def ensure_dirs():
+    """
+    Creates the output and log directories if they don't exist.
+    Called explicitly from main() (after CLI overrides) so importing settings has no filesystem side effects.
+    """
+    for directory in (OUTPUT_VIDEOS_DIR, LOG_DIR):
+        if not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
 
-def validate_config():
+def snapshot():
     """
-    Validates configuration settings.
-    Raises ValueError if any setting is invalid.
+    Returns the current value of every setting (upper-case module attribute), including runtime overrides.
+    Used to hand the parent's configuration to worker processes.
+    """
+    return {name: value for name, value in globals().items() if name.isupper()}
+
+def iter_config_errors():
+    """
+    Yields a message for every invalid configuration setting.
+    Settings are read at call time, so runtime overrides (CLI, tests) are respected.
     """
-    errors = []
-    
     # Validate SMOOTHING_ALPHA
     if not 0.0 <= SMOOTHING_ALPHA <= 1.0:
-        errors.append(f"SMOOTHING_ALPHA must be between 0.0 and 1.0, got {SMOOTHING_ALPHA}")
+        yield f"SMOOTHING_ALPHA must be between 0.0 and 1.0, got {SMOOTHING_ALPHA}"
+    
+    if SMOOTHING_BACKEND not in ('numpy', 'numba'):
+        yield f"SMOOTHING_BACKEND must be 'numpy' or 'numba', got '{SMOOTHING_BACKEND}'"
     
     # Validate CONFIDENCE_THRESHOLD
     if not 0.0 <= CONFIDENCE_THRESHOLD <= 1.0:
-        errors.append(f"CONFIDENCE_THRESHOLD must be between 0.0 and 1.0, got {CONFIDENCE_THRESHOLD}")
+        yield f"CONFIDENCE_THRESHOLD must be between 0.0 and 1.0, got {CONFIDENCE_THRESHOLD}"
     
     # Validate OUTPUT_RESOLUTION
     if not isinstance(OUTPUT_RESOLUTION, tuple) or len(OUTPUT_RESOLUTION) != 2:
-        errors.append(f"OUTPUT_RESOLUTION must be a tuple of (width, height), got {OUTPUT_RESOLUTION}")
-    elif any(v <= 0 for v in OUTPUT_RESOLUTION):
-        errors.append(f"OUTPUT_RESOLUTION dimensions must be positive, got {OUTPUT_RESOLUTION}")
+        yield f"OUTPUT_RESOLUTION must be a tuple of (width, height), got {OUTPUT_RESOLUTION}"
+    elif min(OUTPUT_RESOLUTION) <= 0:
+        yield f"OUTPUT_RESOLUTION dimensions must be positive, got {OUTPUT_RESOLUTION}"
+    
+    # Validate DETECT_RESOLUTION
+    if DETECT_RESOLUTION is not None:
+        if not isinstance(DETECT_RESOLUTION, tuple) or len(DETECT_RESOLUTION) != 2:
+            yield f"DETECT_RESOLUTION must be None or a tuple of (width, height), got {DETECT_RESOLUTION}"
+        elif min(DETECT_RESOLUTION) <= 0:
+            yield f"DETECT_RESOLUTION dimensions must be positive, got {DETECT_RESOLUTION}"
     
     # Validate MIN_TRACK_DURATION_SEC
     if MIN_TRACK_DURATION_SEC < 0:
-        errors.append(f"MIN_TRACK_DURATION_SEC must be non-negative, got {MIN_TRACK_DURATION_SEC}")
+        yield f"MIN_TRACK_DURATION_SEC must be non-negative, got {MIN_TRACK_DURATION_SEC}"
+    
+    # Validate batch and queue sizes
+    for name, value in (('SCAN_BATCH_SIZE', SCAN_BATCH_SIZE), ('PROCESS_BATCH_SIZE', PROCESS_BATCH_SIZE),
+                        ('FRAME_QUEUE_SIZE', FRAME_QUEUE_SIZE), ('POSTPROCESS_QUEUE_SIZE', POSTPROCESS_QUEUE_SIZE),
+                        ('WRITER_QUEUE_SIZE', WRITER_QUEUE_SIZE)):
+        if value < 1:
+            yield f"{name} must be at least 1, got {value}"
+    
+    # Validate writer buffering
+    if WRITER_BATCH < 1:
+        yield f"WRITER_BATCH must be at least 1, got {WRITER_BATCH}"
+    elif WRITER_MAX_INFLIGHT < WRITER_BATCH:
+        yield f"WRITER_MAX_INFLIGHT must be at least WRITER_BATCH ({WRITER_BATCH}), got {WRITER_MAX_INFLIGHT}"
+    if WRITER_MAX_PREBUFFER_FRAMES < 0:
+        yield f"WRITER_MAX_PREBUFFER_FRAMES must be non-negative, got {WRITER_MAX_PREBUFFER_FRAMES}"
+    
+    # Validate ENCODER
+    if ENCODER not in ('mp4v', 'nvenc', 'qsv', 'x264'):
+        yield f"ENCODER must be one of 'mp4v', 'nvenc', 'qsv', 'x264', got '{ENCODER}'"
+    
+    # Validate NUM_WORKERS
+    if not isinstance(NUM_WORKERS, int) or NUM_WORKERS < 1:
+        yield f"NUM_WORKERS (COW_WORKERS) must be an integer of at least 1, got {NUM_WORKERS!r}"
+    
+    # Validate scanner sampling
+    if SCAN_FRAME_STRIDE < 1:
+        yield f"SCAN_FRAME_STRIDE must be at least 1, got {SCAN_FRAME_STRIDE}"
+    if SINGLE_COW_CONFIDENCE_FRAMES is not None and SINGLE_COW_CONFIDENCE_FRAMES < 1:
+        yield f"SINGLE_COW_CONFIDENCE_FRAMES must be None or at least 1, got {SINGLE_COW_CONFIDENCE_FRAMES}"
+    if SINGLE_COW_MAX_SCAN_FRAMES is not None and SINGLE_COW_MAX_SCAN_FRAMES < 1:
+        yield f"SINGLE_COW_MAX_SCAN_FRAMES must be None or at least 1, got {SINGLE_COW_MAX_SCAN_FRAMES}"
     
     # Validate MASK_METHOD
-    if MASK_METHOD not in ['binary', 'soft']:
-        errors.append(f"MASK_METHOD must be 'binary' or 'soft', got '{MASK_METHOD}'")
+    if MASK_METHOD not in ('binary', 'soft'):
+        yield f"MASK_METHOD must be 'binary' or 'soft', got '{MASK_METHOD}'"
+    
+    if MASK_BLEND_BACKEND not in ('opencv', 'numba'):
+        yield f"MASK_BLEND_BACKEND must be 'opencv' or 'numba', got '{MASK_BLEND_BACKEND}'"
     
     # Validate MASK_BLUR_KERNEL_SIZE
     if not isinstance(MASK_BLUR_KERNEL_SIZE, tuple) or len(MASK_BLUR_KERNEL_SIZE) != 2:
-        errors.append(f"MASK_BLUR_KERNEL_SIZE must be a tuple of (width, height)")
-    elif any(v % 2 == 0 or v <= 0 for v in MASK_BLUR_KERNEL_SIZE):
-        errors.append(f"MASK_BLUR_KERNEL_SIZE values must be positive odd numbers, got {MASK_BLUR_KERNEL_SIZE}")
+        yield f"MASK_BLUR_KERNEL_SIZE must be a tuple of (width, height)"
+    elif min(MASK_BLUR_KERNEL_SIZE) <= 0 or any(v % 2 == 0 for v in MASK_BLUR_KERNEL_SIZE):
+        yield f"MASK_BLUR_KERNEL_SIZE values must be positive odd numbers, got {MASK_BLUR_KERNEL_SIZE}"
     
     # Validate BACKGROUND_COLOR
     if not isinstance(BACKGROUND_COLOR, tuple) or len(BACKGROUND_COLOR) != 3:
-        errors.append(f"BACKGROUND_COLOR must be a tuple of (R, G, B)")
-    elif any(not 0 <= v <= 255 for v in BACKGROUND_COLOR):
-        errors.append(f"BACKGROUND_COLOR values must be between 0 and 255, got {BACKGROUND_COLOR}")
+        yield f"BACKGROUND_COLOR must be a tuple of (R, G, B)"
+    elif min(BACKGROUND_COLOR) < 0 or max(BACKGROUND_COLOR) > 255:
+        yield f"BACKGROUND_COLOR values must be between 0 and 255, got {BACKGROUND_COLOR}"
+
+def validate_config(fast: bool = False):
+    """
+    Validates configuration settings.
+    Raises ValueError if any setting is invalid.
+    If fast is True, stops at the first invalid setting instead of collecting all of them.
+    """
+    errors = iter_config_errors()
+    if fast:
+        first_error = next(errors, None)
+        errors = [first_error] if first_error is not None else []
+    else:
+        errors = list(errors)
     
     if errors:
         raise ValueError("Configuration validation failed:\n" + "\n".join(f"  - {err}" for err in errors))
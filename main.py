@@ -2,56 +2,50 @@ import os
 import sys
 import logging
 import argparse
-from src.detector import YoloCowDetector
-from src.writer import CowVideoWriterManager
-from src.processor import CowExtractionProcessor
+from concurrent.futures import ThreadPoolExecutor
+import src
 import config.settings as settings
-from src.scanner import VideoScanner
-import glob
-import shutil
+from src.video_io import list_videos
+from src.log_setup import add_log_handlers
 
-<<<<<<< HEAD
-def select_background_color():
+_YES = frozenset({'y', 'yes'})
+_NO = frozenset({'n', 'no'})
+
+def _prompt_yes_no(question, default):
     """
-    Asks the user to select a background color from a list of ML-friendly options.
-    Returns the selected color tuple (B, G, R).
+    Asks a yes/no question until a valid answer is given.
+    Returns `default` if the prompt is interrupted (EOF or Ctrl+C).
     """
-    colors = {
-        "1": ("Yesil (Makine Ogrenmesi icin Onerilen)", (0, 255, 0)),
-        "2": ("Siyah (Varsayilan)", (0, 0, 0)),
-        "3": ("Beyaz", (255, 255, 255)),
-        "4": ("Mavi (Chroma Key)", (255, 0, 0)),
-        "5": ("Magenta (Yuksek Kontrast)", (255, 0, 255))
-    }
-    
-    print("\n--- Arka Plan Rengi Secimi ---")
-    print("Lutfen videolardaki nesnelerin (ineklerin) daha iyi ayirt edilebilmesi icin bir arka plan rengi secin.")
-    for key, (name, _) in colors.items():
-        print(f"{key}. {name}")
-    
-    choice = input("Seciminiz (1-5) [Varsayilan: 2]: ").strip()
-    
-    if choice in colors:
-        selected_name, color_value = colors[choice]
-        print(f"Secilen Renk: {selected_name}")
-        return color_value
-    else:
-        print("Gecersiz secim veya bos birakildi. Varsayilan renk (Siyah) kullanilacak.")
-        return colors["2"][1]
-
-def main():
-    # --- Background Color Selection ---
-    # Update the settings with the user's choice before processing starts
-    settings.BACKGROUND_COLOR = select_background_color()
+    while True:
+        try:
+            choice = input(question).strip().casefold()
+        except (EOFError, KeyboardInterrupt):
+            logging.getLogger(__name__).warning(
+                f"\nUser interrupted prompt, defaulting to {'yes' if default else 'no'}"
+            )
+            return default
+        if choice in _YES:
+            return True
+        if choice in _NO:
+            return False
 
-    # --- CHECK EXISTING OUTPUT ---
+def _processed_source_stems(output_entries, video_ext):
+    """
+    Returns the stems of the source videos that already have output among `output_entries` (os.DirEntry objects).
+    """
     processed_stems = set()
-    should_delete = False
-=======
+    for entry in output_entries:
+        if entry.is_file(follow_symlinks=False) and entry.name.endswith(video_ext):
+            # Format: {source_stem}_cow_{counter}.mp4
+            # rpartition: the source stem itself may contain '_cow_'
+            source_stem, sep, _ = entry.name.rpartition('_cow_')
+            if sep:
+                processed_stems.add(source_stem)
+    return processed_stems
+
 def setup_logging(verbose=False, log_file=None):
     """
     Configure logging for the application.
->>>>>>> e9870a3794bf323aa2059c715c4b35e9b0fed43b
     
     Args:
         verbose: If True, set log level to DEBUG
@@ -60,31 +54,12 @@ def setup_logging(verbose=False, log_file=None):
     log_level = logging.DEBUG if verbose else getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO)
     log_path = log_file or settings.LOG_FILE
     
-    # Create formatters and handlers
-    formatter = logging.Formatter(
-        settings.LOG_FORMAT,
-        datefmt=settings.LOG_DATE_FORMAT
-    )
-    
-    # Console handler
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(log_level)
-    console_handler.setFormatter(formatter)
-    
-    # File handler
-    file_handler = logging.FileHandler(log_path, encoding='utf-8')
-    file_handler.setLevel(logging.DEBUG)  # Always log everything to file
-    file_handler.setFormatter(formatter)
-    
-    # Configure root logger
-    root_logger = logging.getLogger()
-    root_logger.setLevel(logging.DEBUG)
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    # Logging starts before settings.ensure_dirs(), so make sure the log directory exists
+    log_dir = os.path.dirname(os.path.abspath(log_path))
+    if not os.path.isdir(log_dir):
+        os.makedirs(log_dir, exist_ok=True)
     
-    # Suppress overly verbose third-party loggers
-    logging.getLogger('ultralytics').setLevel(logging.WARNING)
-    logging.getLogger('PIL').setLevel(logging.WARNING)
+    add_log_handlers(log_level, log_path)
     
     return logging.getLogger(__name__)
 
@@ -165,6 +140,13 @@ Examples:
         help=f'Custom log file path (default: {settings.LOG_FILE})'
     )
     
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help=f'Number of worker processes for scanning/processing; each loads its own model (default: {settings.NUM_WORKERS})'
+    )
+    
     parser.add_argument(
         '--no-scan',
         action='store_true',
@@ -178,6 +160,12 @@ def main():
     # Parse command-line arguments
     args = parse_arguments()
     
+    # Recorded in settings so worker processes log to the same file at the same level
+    if args.log_file:
+        settings.LOG_FILE = os.path.abspath(args.log_file)
+    if args.verbose:
+        settings.LOG_LEVEL = 'DEBUG'
+    
     # Setup logging
     logger = setup_logging(verbose=args.verbose, log_file=args.log_file)
     logger.info("=" * 60)
@@ -205,87 +193,89 @@ def main():
             settings.CONFIDENCE_THRESHOLD = args.confidence
             logger.info(f"Confidence threshold overridden: {settings.CONFIDENCE_THRESHOLD}")
         
+        if args.workers is not None:
+            if args.workers < 1:
+                raise ValueError(f"Number of workers must be at least 1, got {args.workers}")
+            settings.NUM_WORKERS = args.workers
+            logger.info(f"Worker processes overridden: {settings.NUM_WORKERS}")
+        
         if args.model != settings.YOLO_MODEL_NAME:
             settings.YOLO_MODEL_NAME = args.model
             logger.info(f"YOLO model overridden: {settings.YOLO_MODEL_NAME}")
         
+        # Create output/log directories only now, so --output-dir never creates the default directory
+        settings.ensure_dirs()
+        
         # --- CHECK EXISTING OUTPUT ---
+        # Settings are final at this point; bind them to locals for the loops below
+        output_dir = settings.OUTPUT_VIDEOS_DIR
+        input_dir = settings.INPUT_VIDEOS_DIR
         processed_stems = set()
         should_delete = args.clean
         
-        if os.path.exists(settings.OUTPUT_VIDEOS_DIR) and len(os.listdir(settings.OUTPUT_VIDEOS_DIR)) > 0:
-            logger.info(f"Found existing output in: {settings.OUTPUT_VIDEOS_DIR}")
+        # List the output directory once; the entries serve both the prompt check and the resume parse
+        try:
+            with os.scandir(output_dir) as it:
+                output_entries = list(it)
+        except FileNotFoundError:
+            output_entries = []
+        
+        if output_entries:
+            logger.info(f"Found existing output in: {output_dir}")
             
             if args.resume:
                 should_delete = False
                 logger.info("Resume mode enabled - will continue from previous run")
             elif not args.clean:
-                # Interactive prompt
-                while True:
-                    try:
-                        choice = input("Delete existing output and start over? (y/n): ").strip().lower()
-                        if choice in ['y', 'yes']:
-                            should_delete = True
-                            break
-                        elif choice in ['n', 'no']:
-                            should_delete = False
-                            break
-                    except (EOFError, KeyboardInterrupt):
-                        logger.warning("\nUser interrupted prompt, defaulting to resume mode")
-                        should_delete = False
-                        break
+                # Interactive prompt (defaults to resume mode if interrupted)
+                should_delete = _prompt_yes_no("Delete existing output and start over? (y/n): ", default=False)
         
         # --- Cleanup Output Directory ---
         if should_delete:
-            if os.path.exists(settings.OUTPUT_VIDEOS_DIR):
-                logger.info(f"Cleaning previous output: {settings.OUTPUT_VIDEOS_DIR}")
+            if output_entries:
+                logger.info(f"Cleaning previous output: {output_dir}")
+                import shutil  # Only needed on this branch
                 try:
-                    shutil.rmtree(settings.OUTPUT_VIDEOS_DIR)
-                    os.makedirs(settings.OUTPUT_VIDEOS_DIR, exist_ok=True)
+                    shutil.rmtree(output_dir)
+                    os.makedirs(output_dir, exist_ok=True)
                     logger.info("Output directory cleaned successfully")
                 except OSError as e:
                     logger.error(f"Error cleaning output directory: {e}")
                     raise
         else:
             # Resume mode: find what's already done
-            if os.path.exists(settings.OUTPUT_VIDEOS_DIR):
+            if output_entries:
                 logger.info("Scanning existing output to resume...")
-                existing_files = os.listdir(settings.OUTPUT_VIDEOS_DIR)
-                for f in existing_files:
-                    if f.endswith(settings.VIDEO_EXT):
-                        # Format: {source_stem}_cow_{counter}.mp4
-                        parts = f.split('_cow_')
-                        if len(parts) > 1:
-                            source_stem = parts[0]
-                            processed_stems.add(source_stem)
+                processed_stems = _processed_source_stems(output_entries, settings.VIDEO_EXT)
                 logger.info(f"Found {len(processed_stems)} already processed videos.")
         
         # Ensure input directory exists
-        if not os.path.exists(settings.INPUT_VIDEOS_DIR):
-            logger.warning(f"Input directory '{settings.INPUT_VIDEOS_DIR}' does not exist.")
+        if not os.path.exists(input_dir):
+            logger.warning(f"Input directory '{input_dir}' does not exist.")
             logger.info("Creating empty input directory...")
-            os.makedirs(settings.INPUT_VIDEOS_DIR, exist_ok=True)
+            os.makedirs(input_dir, exist_ok=True)
             logger.info("Please add video files to the input directory and run again.")
             return
         
         # Initialize dependencies
-        logger.info("Initializing YOLO detector...")
-        detector = YoloCowDetector()
-        
-        # --- STEP 1: Scan for Single Cow Videos ---
-        videos_to_scan = []
-        processed_paths = []
-        
-        if not args.no_scan:
-            logger.info("Initializing video scanner...")
-            scanner = VideoScanner(detector)
-            
-            search_pattern = os.path.join(settings.INPUT_VIDEOS_DIR, f"*{settings.VIDEO_EXT}")
-            all_videos = glob.glob(search_pattern)
+        # Loading YOLO takes seconds and doesn't depend on the input listing, so it runs in a
+        # background thread while the input directory is enumerated.
+        # With several workers, each worker process loads its own model instead.
+        workers = settings.NUM_WORKERS
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            detector_future = None
+            if workers == 1:
+                logger.info("Initializing YOLO detector...")
+                detector_future = executor.submit(src.YoloCowDetector)
+            else:
+                logger.info(f"Using {workers} worker processes, each with its own YOLO detector")
             
+            all_videos = list_videos(input_dir)
             logger.info(f"Found {len(all_videos)} total videos to process")
             
-            # Filter videos to scan: only those NOT processed yet
+            # Split videos into already processed and new ones
+            videos_to_scan = []
+            processed_paths = []
             for video_path in all_videos:
                 stem = os.path.splitext(os.path.basename(video_path))[0]
                 if stem in processed_stems:
@@ -294,34 +284,36 @@ def main():
                 else:
                     videos_to_scan.append(video_path)
             
+            detector = detector_future.result() if detector_future else None
+        
+        # --- STEP 1: Scan for Single Cow Videos ---
+        if not args.no_scan:
+            logger.info("Initializing video scanner...")
+            scanner = src.VideoScanner(detector, cache_path=settings.SCAN_CACHE_FILE, workers=workers)
+            
             # Scan for single-cow videos
             if videos_to_scan:
                 logger.info(f"Starting pre-scan for single-cow videos on {len(videos_to_scan)} videos...")
                 scanner.scan_and_filter(videos_to_scan)
+                # Videos without any cow can't produce output; don't decode and track them again
+                if scanner.cow_free_videos:
+                    logger.info(f"Skipping {len(scanner.cow_free_videos)} videos without cows")
+                    processed_paths.extend(scanner.cow_free_videos)
             else:
                 logger.info("No new videos to scan")
         else:
             logger.info("Skipping single-cow video scan (--no-scan flag)")
-            search_pattern = os.path.join(settings.INPUT_VIDEOS_DIR, f"*{settings.VIDEO_EXT}")
-            all_videos = glob.glob(search_pattern)
-            
-            for video_path in all_videos:
-                stem = os.path.splitext(os.path.basename(video_path))[0]
-                if stem not in processed_stems:
-                    videos_to_scan.append(video_path)
-                else:
-                    processed_paths.append(video_path)
         
         # --- STEP 2: Process the rest ---
         logger.info("Initializing video writer manager...")
-        writer_manager = CowVideoWriterManager(settings.OUTPUT_VIDEOS_DIR)
+        writer_manager = src.CowVideoWriterManager(output_dir, frame_size=settings.OUTPUT_RESOLUTION)
         
         logger.info("Initializing video processor...")
-        processor = CowExtractionProcessor(detector, writer_manager)
+        processor = src.CowExtractionProcessor(detector, writer_manager)
         
         # Process videos
         logger.info("Starting video processing...")
-        processor.process_all_videos(skip_list=processed_paths)
+        processor.process_all_videos(skip_list=processed_paths, workers=workers)
         
         logger.info("=" * 60)
         logger.info("Cow Extraction Project - Completed Successfully")
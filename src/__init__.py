@@ -0,0 +1,28 @@
+"""
+Cow extraction package.
+
+The public classes are resolved lazily (PEP 562) so that importing ``src``
+does not pull in OpenCV, torch or ultralytics until they are actually needed.
+"""
+
+_LAZY_ATTRS = {
+    'YoloCowDetector': 'src.detector',
+    'CowVideoWriterManager': 'src.writer',
+    'CowExtractionProcessor': 'src.processor',
+    'VideoScanner': 'src.scanner',
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value  # Cache so __getattr__ is only hit once per name
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
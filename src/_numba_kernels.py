@@ -0,0 +1,37 @@
+"""
+Numba-compiled kernels behind src.kernels. Importing this module imports numba,
+so it is only loaded on first use of a kernel (see src.kernels).
+"""
+import numpy as np
+from numba import njit, prange
+
+@njit(parallel=True, fastmath=True, cache=True)
+def blend_u8(fg: np.ndarray, bg: np.ndarray, alpha: np.ndarray, out: np.ndarray):
+    """
+    out = fg * alpha + bg * (1 - alpha), in integer arithmetic on uint8 images.
+    fg, bg, out: (H, W, 3) uint8. alpha: (H, W) uint8 in the 0-255 range.
+    Rows are processed in parallel.
+    """
+    for y in prange(fg.shape[0]):
+        for x in range(fg.shape[1]):
+            a = np.int32(alpha[y, x])
+            inv = 255 - a
+            for c in range(3):
+                out[y, x, c] = (np.int32(fg[y, x, c]) * a + np.int32(bg[y, x, c]) * inv + 127) // 255
+
+@njit(cache=True, fastmath=True)
+def ema_rows(rows: np.ndarray, indices: np.ndarray, boxes: np.ndarray, is_new: np.ndarray, alpha: float):
+    """
+    In-place EMA update of the smoother's track rows: rows[indices[i]] = alpha * boxes[i] + (1 - alpha) * rows[indices[i]].
+    Rows flagged in is_new are initialized with the box itself.
+    rows: (capacity, 4 or more) float64, only the first 4 columns are touched. indices: (N,) intp. boxes: (N, 4) float64. is_new: (N,) bool.
+    """
+    one_minus_alpha = 1.0 - alpha
+    for i in range(indices.shape[0]):
+        r = indices[i]
+        if is_new[i]:
+            for k in range(4):
+                rows[r, k] = boxes[i, k]
+        else:
+            for k in range(4):
+                rows[r, k] = alpha * boxes[i, k] + one_minus_alpha * rows[r, k]
@@ -0,0 +1,93 @@
+"""
+Video decoding helpers: capture opening (CPU or NVDEC) and detection-size downscaling.
+"""
+import logging
+from typing import Tuple
+import cv2
+import numpy as np
+import config.settings as settings
+
+logger = logging.getLogger(__name__)
+
+def resize_for_detection(frame: np.ndarray) -> Tuple[np.ndarray, Tuple[float, float]]:
+    """
+    Downscales `frame` to fit within settings.DETECT_RESOLUTION, preserving the aspect ratio.
+    Returns (detection_frame, (sx, sy)) where multiplying detection coordinates by (sx, sy)
+    maps them back to `frame`. Frames that already fit are returned unchanged with scale (1.0, 1.0).
+    """
+    max_size = settings.DETECT_RESOLUTION
+    if max_size is None:
+        return frame, (1.0, 1.0)
+    h, w = frame.shape[:2]
+    fx = min(max_size[0] / w, max_size[1] / h)
+    if fx >= 1.0:
+        return frame, (1.0, 1.0)
+    small_w = max(1, round(w * fx))
+    small_h = max(1, round(h * fx))
+    small = cv2.resize(frame, (small_w, small_h), interpolation=cv2.INTER_AREA)
+    return small, (w / small_w, h / small_h)
+
+class NvdecCapture:
+    """
+    Minimal cv2.VideoCapture-compatible wrapper (isOpened/get/grab/retrieve/read/release)
+    around cv2.cudacodec.VideoReader.
+    Frames are decoded on the GPU (NVDEC) and downloaded as BGR arrays, since cropping
+    and masking run on the CPU.
+    """
+    def __init__(self, reader):
+        self._reader = reader
+
+    def isOpened(self) -> bool:
+        return self._reader is not None
+
+    def get(self, prop_id: int) -> float:
+        # Unsupported properties read as 0, like cv2.VideoCapture
+        try:
+            ok, value = self._reader.get(prop_id)
+        except (cv2.error, TypeError, ValueError):
+            return 0.0
+        return value if ok else 0.0
+
+    def grab(self) -> bool:
+        return self._reader.grab()
+
+    def retrieve(self):
+        ok, gpu_frame = self._reader.retrieve()
+        if not ok:
+            return False, None
+        return True, self._download(gpu_frame)
+
+    def read(self):
+        ok, gpu_frame = self._reader.nextFrame()
+        if not ok:
+            return False, None
+        return True, self._download(gpu_frame)
+
+    def release(self):
+        self._reader = None
+
+    @staticmethod
+    def _download(gpu_frame) -> np.ndarray:
+        frame = gpu_frame.download()
+        # cudacodec delivers BGRA by default
+        if frame.ndim == 3 and frame.shape[2] == 4:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        return frame
+
+_nvdec_warned = False
+
+def open_video(video_path: str):
+    """
+    Opens `video_path` for reading.
+    With settings.USE_NVDEC, decoding happens on the GPU via cv2.cudacodec; if OpenCV was built
+    without CUDA video support (or the reader can't be created) the CPU cv2.VideoCapture is used.
+    """
+    global _nvdec_warned
+    if settings.USE_NVDEC:
+        try:
+            return NvdecCapture(cv2.cudacodec.createVideoReader(video_path))
+        except (AttributeError, cv2.error) as e:
+            if not _nvdec_warned:
+                logger.warning(f"NVDEC decoding unavailable, falling back to CPU decoding: {e}")
+                _nvdec_warned = True
+    return cv2.VideoCapture(video_path)
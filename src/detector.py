@@ -1,7 +1,7 @@
+from __future__ import annotations
+
 from typing import List, Any
 import logging
-import numpy as np
-from ultralytics import YOLO
 from src.interfaces import IDetector
 import config.settings as settings
 
@@ -9,25 +9,91 @@ logger = logging.getLogger(__name__)
 
 class YoloCowDetector(IDetector):
     def __init__(self, model_path: str = settings.YOLO_MODEL_NAME):
+        # Imported lazily: ultralytics pulls in torch/torchvision and costs seconds on cold start
+        import torch
+        from ultralytics import YOLO
+
         logger.info(f"Initializing YOLO detector with model: {model_path}")
         try:
             self.model = YOLO(model_path)
-            logger.info(f"YOLO model loaded successfully")
+            # Resolve the device once instead of letting ultralytics re-resolve it on every call
+            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            self.model.to(self.device)
+            logger.info(f"YOLO model loaded successfully on {self.device}")
         except Exception as e:
             logger.error(f"Failed to load YOLO model: {e}")
             raise
         
         self.target_class_id = settings.TARGET_CLASS_ID
         self.conf_threshold = settings.CONFIDENCE_THRESHOLD
-        logger.debug(f"Target class ID: {self.target_class_id}, Confidence threshold: {self.conf_threshold}")
+        # Half precision halves weight/activation bandwidth on GPU; it is not supported on CPU
+        self.half = settings.USE_FP16 and self.device != 'cpu'
+        # Inference never backpropagates, so skip autograd bookkeeping entirely
+        self._inference_mode = torch.inference_mode
+        logger.debug(f"Target class ID: {self.target_class_id}, Confidence threshold: {self.conf_threshold}, FP16: {self.half}")
+
+        if settings.DETECTOR_WARMUP:
+            self._warmup()
+
+    def _warmup(self):
+        """
+        Runs one dummy inference so CUDA context creation, kernel selection and predictor setup
+        happen during initialization instead of on the first real frame.
+        Uses detect() so no tracker state is created.
+        """
+        import numpy as np
+
+        logger.debug("Warming up YOLO detector...")
+        self.detect(np.zeros((640, 640, 3), dtype=np.uint8))
 
     def detect_and_track(self, frame: np.ndarray) -> List[Any]:
         # Persist=True is crucial for tracking to keep IDs consistent across frames
-        results = self.model.track(
-            frame, 
-            persist=True, 
-            verbose=False, 
-            classes=[self.target_class_id],
-            conf=self.conf_threshold
-        )
+        with self._inference_mode():
+            results = self.model.track(
+                frame, 
+                persist=True, 
+                verbose=False, 
+                classes=[self.target_class_id],
+                conf=self.conf_threshold,
+                device=self.device,
+                half=self.half
+            )
         return results
+
+    def detect_and_track_batch(self, frames: List[np.ndarray]) -> List[Any]:
+        # For non-stream sources ultralytics feeds every image of a batch through the same
+        # tracker in order, so consecutive frames can be tracked in one call
+        with self._inference_mode():
+            return self.model.track(
+                frames,
+                persist=True,
+                verbose=False,
+                classes=[self.target_class_id],
+                conf=self.conf_threshold,
+                device=self.device,
+                half=self.half
+            )
+
+    def detect(self, frame: np.ndarray) -> List[Any]:
+        # No tracker: used where only per-frame counts matter (e.g. the single-cow scanner)
+        with self._inference_mode():
+            return self.model(
+                frame,
+                verbose=False,
+                classes=[self.target_class_id],
+                conf=self.conf_threshold,
+                device=self.device,
+                half=self.half
+            )
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[Any]:
+        # Plain prediction (no tracker state) on a list of frames: one forward pass per batch
+        with self._inference_mode():
+            return self.model(
+                frames,
+                verbose=False,
+                classes=[self.target_class_id],
+                conf=self.conf_threshold,
+                device=self.device,
+                half=self.half
+            )
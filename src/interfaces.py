@@ -14,6 +14,38 @@ class IDetector(ABC):
         """
         pass
 
+    def detect_and_track_batch(self, frames: List[np.ndarray]) -> List[Any]:
+        """
+        Detects and tracks objects in consecutive frames of the same video.
+        Returns one result per frame, in frame order (None if nothing was returned for that frame).
+        The default implementation falls back to per-frame detect_and_track.
+        """
+        batch_results = []
+        for frame in frames:
+            results = self.detect_and_track(frame)
+            batch_results.append(results[0] if results else None)
+        return batch_results
+
+    def detect(self, frame: np.ndarray) -> List[Any]:
+        """
+        Detects objects in the given frame without updating any tracker state.
+        Same result format as detect_and_track, but IDs may be missing.
+        The default implementation falls back to detect_and_track.
+        """
+        return self.detect_and_track(frame)
+
+    def detect_batch(self, frames: List[np.ndarray]) -> List[Any]:
+        """
+        Detects objects in a batch of frames without tracking.
+        Returns one result per frame (None if nothing was returned for that frame).
+        The default implementation falls back to per-frame detect.
+        """
+        batch_results = []
+        for frame in frames:
+            results = self.detect(frame)
+            batch_results.append(results[0] if results else None)
+        return batch_results
+
 class IVideoProcessor(ABC):
     """
     Interface for video processing logic.
@@ -33,9 +65,18 @@ class IWriterManager(ABC):
     def write_frame(self, track_id: int, frame: np.ndarray, fps: float):
         """
         Writes a frame to the video file corresponding to the track_id.
+        The caller may reuse `frame` afterwards, unless it was obtained from acquire_frame().
         """
         pass
 
+    def acquire_frame(self, height: int, width: int) -> np.ndarray:
+        """
+        Returns an uninitialized (height, width, 3) uint8 buffer to render an output frame into.
+        Passing it to write_frame() hands it back to the writer, which may then skip copying it.
+        Default implementation: a fresh array.
+        """
+        return np.empty((height, width, 3), dtype=np.uint8)
+
     @abstractmethod
     def close_all(self):
         """
@@ -43,6 +84,13 @@ class IWriterManager(ABC):
         """
         pass
 
+    @abstractmethod
+    def abort(self):
+        """
+        Discards all open tracks without saving them (e.g. after the source video failed to decode).
+        """
+        pass
+
     @abstractmethod
     def reset_track_mapping(self, source_stem: str = None):
         """
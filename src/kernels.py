@@ -0,0 +1,24 @@
+"""
+Optional Numba-compiled pixel kernels.
+numba is not a hard dependency: when it isn't installed NUMBA_AVAILABLE is False and
+callers keep using their OpenCV/NumPy implementations.
+The kernels are resolved lazily (PEP 562), so numba is only imported once a caller actually
+uses one (MASK_BLEND_BACKEND / SMOOTHING_BACKEND set to 'numba'), not by importing this module.
+"""
+import importlib.util
+
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+
+# Kernel name -> defined in src._numba_kernels:
+#   blend_u8(fg, bg, alpha, out)                  - uint8 alpha blend, rows in parallel
+#   ema_rows(rows, indices, boxes, is_new, alpha) - in-place EMA update of BoxSmoother rows
+_KERNELS = ('blend_u8', 'ema_rows')
+
+def __getattr__(name):
+    if name not in _KERNELS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    from src import _numba_kernels
+    value = getattr(_numba_kernels, name)
+    globals()[name] = value  # Cache so __getattr__ is only hit once per name
+    return value
@@ -0,0 +1,45 @@
+import sys
+import logging
+import logging.handlers
+import config.settings as settings
+
+def add_log_handlers(console_level: int, log_path: str, delay: bool = False):
+    """
+    Installs the application's log handlers on the root logger: console at `console_level`,
+    everything (DEBUG and up) to `log_path`. Shared by the main process and the worker processes.
+    The file is opened in append mode, so several processes can share it;
+    `delay` postpones opening it until the first record is written.
+    """
+    formatter = logging.Formatter(
+        settings.LOG_FORMAT,
+        datefmt=settings.LOG_DATE_FORMAT
+    )
+    
+    # Console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(console_level)
+    console_handler.setFormatter(formatter)
+    
+    # File handler
+    file_handler = logging.FileHandler(log_path, encoding='utf-8', delay=delay)
+    file_handler.setLevel(logging.DEBUG)  # Always log everything to file
+    file_handler.setFormatter(formatter)
+    
+    # Buffer file records so per-frame DEBUG logging doesn't cost one write() per record.
+    # The buffer is flushed when full, on ERROR records, and by logging.shutdown() at exit.
+    buffered_file_handler = logging.handlers.MemoryHandler(
+        capacity=settings.LOG_BUFFER_CAPACITY,
+        flushLevel=logging.ERROR,
+        target=file_handler
+    )
+    buffered_file_handler.setLevel(logging.DEBUG)
+    
+    # Configure root logger
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG)
+    root_logger.addHandler(console_handler)
+    root_logger.addHandler(buffered_file_handler)
+    
+    # Suppress overly verbose third-party loggers
+    logging.getLogger('ultralytics').setLevel(logging.WARNING)
+    logging.getLogger('PIL').setLevel(logging.WARNING)
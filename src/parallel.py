@@ -0,0 +1,35 @@
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import config.settings as settings
+from src.log_setup import add_log_handlers
+
+def _bootstrap_worker(settings_overrides: dict, initializer, initargs: tuple):
+    # Children start from a fresh interpreter ('spawn'), so runtime overrides (CLI flags) are re-applied
+    for name, value in settings_overrides.items():
+        setattr(settings, name, value)
+
+    # Same handlers as the parent (see main.setup_logging), so worker logs also reach LOG_FILE
+    add_log_handlers(getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO), settings.LOG_FILE, delay=True)
+
+    initializer(*initargs)
+
+def default_detector_factory():
+    """
+    Builds the YOLO detector used when no detector factory is given (picklable, so it can be handed to workers).
+    src.detector is imported here, after a worker applied the settings overrides, so it sees the overridden model.
+    """
+    from src.detector import YoloCowDetector
+    return YoloCowDetector(settings.YOLO_MODEL_NAME)
+
+def create_process_pool(workers: int, initializer, initargs: tuple = ()) -> ProcessPoolExecutor:
+    """
+    Creates a process pool whose workers see the parent's current settings and run `initializer(*initargs)` once.
+    Uses the 'spawn' start method so CUDA/torch state is never inherited through fork.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_bootstrap_worker,
+        initargs=(settings.snapshot(), initializer, initargs)
+    )
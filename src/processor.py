@@ -1,24 +1,109 @@
 import cv2
-import glob
 import os
+import queue
 import logging
+import threading
 import numpy as np
+from concurrent.futures import as_completed
+from typing import Callable, List, Optional, Tuple
 from tqdm import tqdm
 from src.interfaces import IDetector, IWriterManager, IVideoProcessor
 from src.smoother import BoxSmoother
+from src.video_io import list_videos
+from src.capture import open_video, resize_for_detection
+from src.parallel import create_process_pool, default_detector_factory
+from src import kernels
 import config.settings as settings
 
 logger = logging.getLogger(__name__)
 
+# Per-process processor used when processing in parallel (see process_all_videos)
+_worker_processor = None
+
+def _init_processor_worker(processor_factory: Callable[[], 'CowExtractionProcessor']):
+    global _worker_processor
+    _worker_processor = processor_factory()
+
+def _process_in_worker(video_path: str) -> str:
+    _worker_processor.process_video(video_path)
+    return video_path
+
+def _put_while(q: queue.Queue, item, keep_going: Callable[[], bool]) -> bool:
+    """
+    Puts `item` on the bounded queue `q`, giving up (returning False) as soon as `keep_going()` is False.
+    """
+    while keep_going():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def _frame_reader(cap: cv2.VideoCapture, frame_queue: queue.Queue, stop_event: threading.Event, errors: list):
+    """
+    Reads frames from `cap` into `frame_queue` as (frame, detect_frame, scale) tuples until the video ends
+    or `stop_event` is set (see resize_for_detection). Always finishes with a None sentinel so the
+    consumer never blocks forever. Exceptions are stored in `errors` for the caller to re-raise,
+    since the sentinel alone would look like a normal end of video.
+    """
+    def put(item) -> bool:
+        return _put_while(frame_queue, item, lambda: not stop_event.is_set())
+
+    try:
+        while not stop_event.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                break
+            # Downscaling for detection happens here too, off the detection thread
+            detect_frame, scale = resize_for_detection(frame)
+            if not put((frame, detect_frame, scale)):
+                break
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        put(None)
+
+def build_default_processor() -> 'CowExtractionProcessor':
+    """
+    Builds a processor with its own YOLO detector and writer manager.
+    Used as the per-worker factory for parallel processing.
+    """
+    from src.writer import CowVideoWriterManager
+    writer_manager = CowVideoWriterManager(settings.OUTPUT_VIDEOS_DIR, frame_size=settings.OUTPUT_RESOLUTION)
+    return CowExtractionProcessor(default_detector_factory(), writer_manager)
+
 class CowExtractionProcessor(IVideoProcessor):
     def __init__(self, detector: IDetector, writer_manager: IWriterManager):
         self.detector = detector
         self.writer_manager = writer_manager
         self.smoother = BoxSmoother()
+        # Scratch buffers reused across detections, allocated on first use and grown when a larger
+        # crop needs them. Masking takes views of the top-left corner.
+        self._mask_buf = None     # single-channel mask, frame-sized
+        self._bg_buf = None       # background color image, frame-sized
+
+        # Masking settings are resolved once here instead of on every detection
+        method = getattr(settings, 'MASK_METHOD', 'soft')
+        if method == 'binary':
+            self._mask_fn = self._apply_binary_mask
+        else:
+            if method != 'soft':
+                logger.warning(f"Unknown mask method '{method}'. Defaulting to soft mask.")
+            self._mask_fn = self._apply_soft_mask
+        self.background_color = tuple(settings.BACKGROUND_COLOR)
+        self._dilation_iterations = getattr(settings, 'MASK_DILATION_ITERATIONS', 2)
+        self._blur_size = tuple(getattr(settings, 'MASK_BLUR_KERNEL_SIZE', (15, 15)))
+        self._dilate_kernel = np.ones((3, 3), np.uint8)
+
+        self._use_numba_blend = settings.MASK_BLEND_BACKEND == 'numba'
+        if self._use_numba_blend and not kernels.NUMBA_AVAILABLE:
+            logger.warning("MASK_BLEND_BACKEND is 'numba' but numba is not installed; using OpenCV blending")
+            self._use_numba_blend = False
 
     def process_video(self, video_path: str):
         logger.info(f"Processing video: {os.path.basename(video_path)}")
-        cap = cv2.VideoCapture(video_path)
+        cap = open_video(video_path)
         if not cap.isOpened():
             logger.error(f"Error opening video: {video_path}")
             return
@@ -43,193 +128,374 @@ class CowExtractionProcessor(IVideoProcessor):
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
         # Create progress bar for frame processing
-        pbar = tqdm(total=total_frames, desc=f"Processing {video_stem}", unit="frame", leave=False)
+        pbar = tqdm(total=total_frames, desc=f"Processing {video_stem}", unit="frame", leave=False, mininterval=0.5)
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            # Use fixed resolution for consistent processing if needed, 
-            # currently just processing whatever resolution the video is.
+        # Three-stage pipeline so decoding, detection and post-processing overlap:
+        #   reader thread:  decode + downscale for detection (cv2 releases the GIL)
+        #   this thread:    batched detection/tracking
+        #   post thread:    crop, mask, letterbox and write, in frame order
+        frame_queue = queue.Queue(maxsize=max(1, settings.FRAME_QUEUE_SIZE))
+        stop_event = threading.Event()
+        reader_errors = []
+        reader = threading.Thread(target=_frame_reader, args=(cap, frame_queue, stop_event, reader_errors),
+                                  daemon=True)
+        reader.start()
 
-            results = self.detector.detect_and_track(frame)
-            
-            if results and len(results) > 0:
-                res = results[0]
-                
-                if res.boxes is not None and res.boxes.id is not None:
-                    boxes = res.boxes.xyxy.cpu().numpy().astype(int)
-                    ids = res.boxes.id.cpu().numpy().astype(int)
-                    
-                    # Get masks if available
-                    segments = None
-                    if res.masks is not None:
-                        segments = res.masks.xy
-
-                    for i, (box, track_id) in enumerate(zip(boxes, ids)):
-                        # -------------------------
-                        # 1. Partial Cow Filter
-                        # -------------------------
-                        raw_x1, raw_y1, raw_x2, raw_y2 = box
-                        img_h, img_w = frame.shape[:2]
-                        margin = settings.BORDER_MARGIN
-
-                        # Check if box touches border (using raw detection to be safe)
-                        if (raw_x1 <= margin) or (raw_y1 <= margin) or (raw_x2 >= img_w - margin) or (raw_y2 >= img_h - margin):
-                            continue
-
-                        # Apply smoothing to the box
-                        box = self.smoother.update(track_id, box)
-                        
-                        x1, y1, x2, y2 = box
-                        
-                        # Apply padding to ensure we don't cut off edges (hooves, tails)
-                        padding = getattr(settings, 'CROP_PADDING', 0)
-                        x1 -= padding
-                        y1 -= padding
-                        x2 += padding
-                        y2 += padding
-                        
-                        # Ensure coordinates are within frame
-                        x1 = max(0, x1)
-                        y1 = max(0, y1)
-                        x2 = min(frame.shape[1], x2)
-                        y2 = min(frame.shape[0], y2)
-
-                        # -------------------------
-                        # 2. Background Removal
-                        # -------------------------
-                        # Default to original frame
-                        source_frame = frame
-                        
-                        # Apply mask if available
-                        if segments is not None and len(segments) > i:
-                            seg = segments[i]
-                            if seg is not None and len(seg) > 0:
-                                source_frame = self._apply_mask(frame, seg)
-                        
-                        cow_crop = source_frame[y1:y2, x1:x2]
-                        
-                        if cow_crop.size == 0:
-                            continue
-
-                        # Standardize resolution with PADDING (Letterboxing) to prevent distortion
-                        target_w, target_h = settings.OUTPUT_RESOLUTION
-                        h, w = cow_crop.shape[:2]
-                        
-                        # Create black canvas
-                        canvas = np.zeros((target_h, target_w, 3), dtype=np.uint8)
-                        
-                        # Scaling logic: Only scale DOWN if crop is larger than target
-                        # Otherwise keep original size to avoid "zoom"
-                        scale = 1.0
-                        if w > target_w or h > target_h:
-                            scale = min(target_w / w, target_h / h)
-                            new_w = int(w * scale)
-                            new_h = int(h * scale)
-                            cow_crop = cv2.resize(cow_crop, (new_w, new_h))
-                            h, w = new_h, new_w # Update dims after resize
-                        
-                        # Calculate centering position
-                        x_offset = (target_w - w) // 2
-                        y_offset = (target_h - h) // 2
-                        
-                        # Place crop on canvas
-                        canvas[y_offset:y_offset+h, x_offset:x_offset+w] = cow_crop
-                        
-                        # Use canvas as the frame to write
-                        cow_crop = canvas
-                        
-                        self.writer_manager.write_frame(track_id, cow_crop, fps)
-            
-            pbar.update(1)
+        result_queue = queue.Queue(maxsize=max(1, settings.POSTPROCESS_QUEUE_SIZE))
+        post_errors = []
+        post = threading.Thread(target=self._postprocess_worker, args=(result_queue, fps, pbar, post_errors),
+                                daemon=True)
+        post.start()
+
+        # Frames are sent to the detector in batches to amortize per-call inference overhead.
+        # Results come back in frame order, so tracking and smoothing see frames sequentially.
+        batch_size = max(1, settings.PROCESS_BATCH_SIZE)
+        batch = []
+        # Detection runs on frames downscaled to DETECT_RESOLUTION; crops come from the full-resolution frames
+        detect_batch = []
+        scales = []
+
+        detect_errors = []
+        try:
+            while not post_errors:
+                item = frame_queue.get()
+                if item is not None:
+                    frame, detect_frame, scale = item
+                    batch.append(frame)
+                    detect_batch.append(detect_frame)
+                    scales.append(scale)
+
+                if batch and (len(batch) >= batch_size or item is None):
+                    batch_results = self.detector.detect_and_track_batch(detect_batch)
+                    _put_while(result_queue, (batch, batch_results, scales), post.is_alive)
+                    batch = []
+                    detect_batch = []
+                    scales = []
+
+                if item is None:
+                    break
+        except BaseException as e:
+            detect_errors.append(e)
+        finally:
+            stop_event.set()
+            reader.join()
+            # Let the post thread drain what was already detected, then stop it
+            _put_while(result_queue, None, post.is_alive)
+            post.join()
+
+        # A failed read must not be finalized as a complete video (close_all would save the truncated tracks).
+        # The open tracks are discarded right away, so a reused processor does not save them on its next reset.
+        errors = reader_errors + detect_errors + post_errors
+        if errors:
+            pbar.close()
+            cap.release()
+            self.writer_manager.abort()
+            raise errors[0]
 
         pbar.close()
         cap.release()
         self.writer_manager.close_all()
 
-    def process_all_videos(self, skip_list=None):
+    def _postprocess_worker(self, result_queue: queue.Queue, fps: float, pbar: tqdm, errors: list):
+        """
+        Post-processing stage of process_video: takes (frames, results, scales) batches from `result_queue`
+        until a None sentinel and runs _process_frame on every frame. A single thread keeps frames in order
+        for the smoother and the writers. Exceptions are stored in `errors` for the caller to re-raise.
+        """
+        try:
+            while True:
+                item = result_queue.get()
+                if item is None:
+                    break
+                batch, batch_results, scales = item
+                for batch_frame, res, scale in zip(batch, batch_results, scales):
+                    self._process_frame(batch_frame, res, fps, scale)
+                # One progress update per batch instead of per frame
+                pbar.update(len(batch))
+        except BaseException as e:
+            errors.append(e)
+
+    def _process_frame(self, frame: np.ndarray, res, fps: float, scale: Tuple[float, float] = (1.0, 1.0)):
+        """
+        Crops, masks and letterboxes every tracked cow in `frame` and hands the result to the writer manager.
+        `res` is the detector result for this frame (or None).
+        `scale` (sx, sy) maps detection coordinates to `frame` when detection ran on a downscaled copy.
+        """
+        if res is None or res.boxes is None or res.boxes.id is None:
+            return
+
+        # One device->host copy for boxes and track IDs: for tracked results the rows of
+        # boxes.data are (x1, y1, x2, y2, track_id, conf, cls)
+        data = res.boxes.data.cpu().numpy()
+        ids = data[:, 4].astype(int)
+        sx, sy = scale
+        scaled = sx != 1.0 or sy != 1.0
+        if scaled:
+            boxes = (data[:, :4] * np.array([sx, sy, sx, sy], dtype=np.float32)).astype(int)
+        else:
+            boxes = data[:, :4].astype(int)
+        
+        # Per-frame constants, looked up once instead of per detection
+        img_h, img_w = frame.shape[:2]
+        margin = settings.BORDER_MARGIN
+        padding = getattr(settings, 'CROP_PADDING', 0)
+        target_w, target_h = settings.OUTPUT_RESOLUTION
+
+        # -------------------------
+        # 1. Partial Cow Filter
+        # -------------------------
+        # Drop boxes touching the border (using raw detection to be safe), for all detections at once
+        keep = ((boxes[:, 0] > margin) & (boxes[:, 1] > margin) &
+                (boxes[:, 2] < img_w - margin) & (boxes[:, 3] < img_h - margin))
+        # Original detection indices, used to look up the matching segments
+        indices = np.flatnonzero(keep)
+        if len(indices) == 0:
+            return
+        ids = ids[indices]
+
+        # Get masks if available, as int32 polygons in frame coordinates (converted once per kept detection)
+        polygons = [None] * len(indices)
+        if res.masks is not None:
+            segments = res.masks.xy
+            seg_scale = np.array([sx, sy], dtype=np.float32) if scaled else None
+            for n, i in enumerate(indices):
+                if i < len(segments):
+                    seg = segments[i]
+                    if seg is not None and len(seg) > 0:
+                        polygons[n] = (seg * seg_scale if scaled else seg).astype(np.int32)
+
+        # Apply smoothing to the boxes
+        crop_boxes = self.smoother.update_batch(ids.tolist(), boxes[indices])
+
+        # Apply padding to ensure we don't cut off edges (hooves, tails)
+        crop_boxes[:, :2] -= padding
+        crop_boxes[:, 2:] += padding
+
+        # Ensure coordinates are within frame
+        np.maximum(crop_boxes[:, :2], 0, out=crop_boxes[:, :2])
+        np.minimum(crop_boxes[:, 2], img_w, out=crop_boxes[:, 2])
+        np.minimum(crop_boxes[:, 3], img_h, out=crop_boxes[:, 3])
+
+        for polygon, track_id, (x1, y1, x2, y2) in zip(polygons, ids, crop_boxes.tolist()):
+            if x2 <= x1 or y2 <= y1:
+                continue
+
+            # -------------------------
+            # 2. Background Removal
+            # -------------------------
+            # Default to the unmasked crop
+            cow_crop = frame[y1:y2, x1:x2]
+            
+            # Apply mask if available (only the crop region is processed)
+            if polygon is not None:
+                cow_crop = self._apply_mask(frame, polygon, x1, y1, x2, y2)
+
+            # Standardize resolution with PADDING (Letterboxing) to prevent distortion
+            h, w = cow_crop.shape[:2]
+            
+            # Crop already has the target size: write it as is
+            if (w, h) != (target_w, target_h):
+                # Output buffer from the writer's frame pool: handed over to write_frame() without a copy
+                canvas = self.writer_manager.acquire_frame(target_h, target_w)
+
+                # Scaling logic: Only scale DOWN if crop is larger than target
+                # Otherwise keep original size to avoid "zoom"
+                new_w, new_h = w, h
+                if w > target_w or h > target_h:
+                    fit = min(target_w / w, target_h / h)
+                    new_w = max(1, int(w * fit))
+                    new_h = max(1, int(h * fit))
+
+                # Calculate centering position
+                top = (target_h - new_h) // 2
+                left = (target_w - new_w) // 2
+                bottom = top + new_h
+                right = left + new_w
+
+                # Only the border strips around the crop are blackened; the center is written once below
+                canvas[:top].fill(0)
+                canvas[bottom:].fill(0)
+                canvas[top:bottom, :left].fill(0)
+                canvas[top:bottom, right:].fill(0)
+
+                # Place crop on canvas (resized straight into place; INTER_AREA is best for shrinking)
+                center = canvas[top:bottom, left:right]
+                if (new_w, new_h) != (w, h):
+                    cv2.resize(cow_crop, (new_w, new_h), dst=center, interpolation=cv2.INTER_AREA)
+                else:
+                    center[...] = cow_crop
+                
+                # Use canvas as the frame to write
+                cow_crop = canvas
+            
+            self.writer_manager.write_frame(track_id, cow_crop, fps)
+
+    def process_all_videos(self, skip_list=None, workers: int = 1,
+                           processor_factory: Optional[Callable[[], 'CowExtractionProcessor']] = None,
+                           detector_factory: Optional[Callable[[], IDetector]] = None):
+        """
+        Processes every video in INPUT_VIDEOS_DIR that is not in skip_list.
+        With workers > 1, videos are processed in separate processes, each owning its own
+        detector, smoother and writer manager built by `processor_factory` (default: build_default_processor).
+        If the videos end up being processed in this process and no detector was given,
+        one is built with `detector_factory` (default: YoloCowDetector).
+        """
         if skip_list is None:
             skip_list = []
             
-        search_pattern = os.path.join(settings.INPUT_VIDEOS_DIR, f"*{settings.VIDEO_EXT}")
-        video_files = glob.glob(search_pattern)
+        video_files = list_videos(settings.INPUT_VIDEOS_DIR)
         
         logger.info(f"Found {len(video_files)} videos in {settings.INPUT_VIDEOS_DIR}")
         
-        # Create progress bar for video-level progress
-        pbar = tqdm(video_files, desc="Processing videos", unit="video")
-        
-        for video_file in pbar:
+        videos_to_process = []
+        for video_file in video_files:
             # Check if video should be skipped
             if video_file in skip_list:
                 logger.info(f"Skipping already processed video: {os.path.basename(video_file)}")
-                continue
+            else:
+                videos_to_process.append(video_file)
+        
+        if workers > 1 and len(videos_to_process) > 1:
+            self._process_parallel(videos_to_process, workers, processor_factory or build_default_processor)
+        else:
+            if videos_to_process and self.detector is None:
+                # Parallel setups don't load a detector in the parent; build one for the in-process path
+                self.detector = (detector_factory or default_detector_factory)()
+            # Create progress bar for video-level progress
+            pbar = tqdm(videos_to_process, desc="Processing videos", unit="video")
             
-            pbar.set_description(f"Processing {os.path.basename(video_file)[:30]}")
-            self.process_video(video_file)
+            for video_file in pbar:
+                pbar.set_description(f"Processing {os.path.basename(video_file)[:30]}")
+                self.process_video(video_file)
 
-        pbar.close()
+            pbar.close()
 
         logger.info("Processing complete.")
 
-    def _apply_mask(self, frame: np.ndarray, segment: np.ndarray) -> np.ndarray:
+    def _process_parallel(self, video_files: List[str], workers: int,
+                          processor_factory: Callable[[], 'CowExtractionProcessor']):
+        workers = min(workers, len(video_files))
+        logger.info(f"Processing {len(video_files)} videos with {workers} worker processes")
+        
+        pool = create_process_pool(workers, _init_processor_worker, (processor_factory,))
+        pbar = tqdm(total=len(video_files), desc="Processing videos", unit="video")
+        try:
+            futures = [pool.submit(_process_in_worker, video_file) for video_file in video_files]
+            for future in as_completed(futures):
+                video_file = future.result()
+                pbar.set_description(f"Processed {os.path.basename(video_file)[:30]}")
+                pbar.update(1)
+        finally:
+            pbar.close()
+            # Don't start queued videos if we stop early (error or Ctrl+C)
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _apply_mask(self, frame: np.ndarray, segment: np.ndarray, x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
         """
         Applies background masking based on the configured method.
+        Only the crop frame[y1:y2, x1:x2] is processed and returned (as a new array).
+        `segment` is an int32 polygon in frame coordinates.
         """
-        img_h, img_w = frame.shape[:2]
-        method = getattr(settings, 'MASK_METHOD', 'soft')
-        
-        if method == 'binary':
-            return self._apply_binary_mask(frame, segment, img_h, img_w)
-        elif method == 'soft':
-            return self._apply_soft_mask(frame, segment, img_h, img_w)
-        else:
-            print(f"Warning: Unknown mask method '{method}'. Defaulting to soft mask.")
-            return self._apply_soft_mask(frame, segment, img_h, img_w)
+        return self._mask_fn(frame, segment, x1, y1, x2, y2)
 
-    def _apply_binary_mask(self, frame: np.ndarray, segment: np.ndarray, h: int, w: int) -> np.ndarray:
+    def _mask_scratch(self, h: int, w: int) -> np.ndarray:
         """
-        Original hard-cut masking.
+        Returns a zeroed (h, w) uint8 view into the reusable mask buffer.
         """
-        mask = np.zeros((h, w), dtype=np.uint8)
-        cv2.fillPoly(mask, [segment.astype(np.int32)], 1)
-        
-        bg_color = settings.BACKGROUND_COLOR 
-        background = np.full(frame.shape, bg_color, dtype=np.uint8)
+        buf = self._mask_buf
+        if buf is None or buf.shape[0] < h or buf.shape[1] < w:
+            # Grow only, so alternating crop sizes don't cause reallocations
+            buf_h, buf_w = (h, w) if buf is None else (max(h, buf.shape[0]), max(w, buf.shape[1]))
+            buf = self._mask_buf = np.empty((buf_h, buf_w), dtype=np.uint8)
+        mask = buf[:h, :w]
+        mask.fill(0)
+        return mask
+
+    def _polygon_mask(self, segment: np.ndarray, img_w: int, img_h: int,
+                      x1: int, y1: int, x2: int, y2: int, value: int) -> np.ndarray:
+        """
+        Returns the (y2 - y1, x2 - x1) region of the filled polygon mask.
+        The polygon is filled on a buffer covering its whole bounding box, so fillPoly never clips
+        it at the region edges (clipping rasterizes edge pixels differently from a full-frame fill).
+        """
+        px, py, pw, ph = cv2.boundingRect(segment)
+        mx1 = max(0, min(x1, px))
+        my1 = max(0, min(y1, py))
+        mx2 = min(img_w, max(x2, px + pw))
+        my2 = min(img_h, max(y2, py + ph))
+        mask = self._mask_scratch(my2 - my1, mx2 - mx1)
+        cv2.fillPoly(mask, [segment], value, offset=(-mx1, -my1))
+        return mask[y1 - my1:y2 - my1, x1 - mx1:x2 - mx1]
+
+    def _background(self, h: int, w: int) -> np.ndarray:
+        """
+        Returns an (h, w, 3) view of a buffer filled with the background color.
+        The buffer is only refilled when it is too small.
+        """
+        buf = self._bg_buf
+        if buf is None or buf.shape[0] < h or buf.shape[1] < w:
+            buf_h, buf_w = (h, w) if buf is None else (max(h, buf.shape[0]), max(w, buf.shape[1]))
+            buf = self._bg_buf = np.full((buf_h, buf_w, 3), self.background_color, dtype=np.uint8)
+        return buf[:h, :w]
+
+    def _apply_binary_mask(self, frame: np.ndarray, segment: np.ndarray, x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
+        """
+        Original hard-cut masking, restricted to the crop region.
+        """
+        img_h, img_w = frame.shape[:2]
+        crop = frame[y1:y2, x1:x2]
+        mask = self._polygon_mask(segment, img_w, img_h, x1, y1, x2, y2, 1)
         
-        mask_bool = mask.astype(bool)
-        return np.where(mask_bool[..., None], frame, background)
+        # Masked copies stay on OpenCV's uint8 path (no bool array, no 3-channel broadcast)
+        if self.background_color == (0, 0, 0):
+            return cv2.bitwise_and(crop, crop, mask=mask)
+        out = self._background(y2 - y1, x2 - x1).copy()
+        cv2.copyTo(crop, mask, out)
+        return out
 
-    def _apply_soft_mask(self, frame: np.ndarray, segment: np.ndarray, h: int, w: int) -> np.ndarray:
+    def _apply_soft_mask(self, frame: np.ndarray, segment: np.ndarray, x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
         """
-        Soft masking with dilation and Gaussian blur for smoother edges.
+        Soft masking with dilation and Gaussian blur for smoother edges, restricted to the crop region.
+        The mask is built on the crop plus the margin that dilation and blur can reach,
+        so the result is identical to masking the full frame and cropping afterwards.
         """
+        img_h, img_w = frame.shape[:2]
+        iterations = self._dilation_iterations
+        blur_size = self._blur_size
+        
+        # Region of interest: crop expanded by the dilation (1px per 3x3 iteration) and blur radius
+        margin_x = iterations + blur_size[0] // 2
+        margin_y = iterations + blur_size[1] // 2
+        rx1 = max(0, x1 - margin_x)
+        ry1 = max(0, y1 - margin_y)
+        rx2 = min(img_w, x2 + margin_x)
+        ry2 = min(img_h, y2 + margin_y)
+
         # 1. Create base binary mask
-        mask = np.zeros((h, w), dtype=np.uint8)
-        cv2.fillPoly(mask, [segment.astype(np.int32)], 255) # Use 0-255 range
+        mask = self._polygon_mask(segment, img_w, img_h, rx1, ry1, rx2, ry2, 255) # Use 0-255 range
 
         # 2. Dilate to include potential edge pixels
-        kernel = np.ones((3, 3), np.uint8)
-        iterations = getattr(settings, 'MASK_DILATION_ITERATIONS', 2)
-        mask = cv2.dilate(mask, kernel, iterations=iterations)
+        cv2.dilate(mask, self._dilate_kernel, dst=mask, iterations=iterations)
 
         # 3. Gaussian Blur for soft alpha
-        blur_size = getattr(settings, 'MASK_BLUR_KERNEL_SIZE', (15, 15))
         mask_blurred = cv2.GaussianBlur(mask, blur_size, 0)
+        mask_blurred = mask_blurred[y1 - ry1:y2 - ry1, x1 - rx1:x2 - rx1]
         
-        # 4. Normalize alpha to 0.0 - 1.0
-        alpha = mask_blurred.astype(float) / 255.0
-        alpha = np.expand_dims(alpha, axis=-1) # (H,W,1)
+        crop = frame[y1:y2, x1:x2]
+        background = self._background(y2 - y1, x2 - x1)
 
-        # 5. Blend
-        bg_color = settings.BACKGROUND_COLOR 
-        background = np.full(frame.shape, bg_color, dtype=np.uint8)
-        
         # Formula: Result = Foreground * Alpha + Background * (1 - Alpha)
-        foreground = frame.astype(float)
-        background = background.astype(float)
-        
-        out = (foreground * alpha + background * (1.0 - alpha))
-        return out.astype(np.uint8)
+        if self._use_numba_blend:
+            # Integer blend with the 0-255 mask as alpha, parallel over rows
+            out = np.empty_like(crop)
+            kernels.blend_u8(crop, background, mask_blurred, out)
+            return out
+
+        # 4. Normalize alpha to 0.0 - 1.0 (float32 weights, as required by cv2.blendLinear)
+        alpha = mask_blurred.astype(np.float32)
+        alpha *= 1.0 / 255.0
+        inv_alpha = 1.0 - alpha
+
+        # 5. Blend
+        # blendLinear works on the uint8 images directly (vectorized, no float64 copies of the crop)
+        return cv2.blendLinear(crop, background, alpha, inv_alpha)
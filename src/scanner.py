@@ -1,23 +1,109 @@
 import cv2
 import os
+import json
 import shutil
 import logging
-from typing import List, Set
+import numpy as np
+from concurrent.futures import as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from tqdm import tqdm
 from src.interfaces import IDetector
+from src.parallel import create_process_pool, default_detector_factory
+from src.capture import open_video, resize_for_detection
 import config.settings as settings
 
 logger = logging.getLogger(__name__)
 
+# Per-process scanner used when scanning in parallel (see VideoScanner._iter_scan_results)
+_worker_scanner = None
+
+def _init_scan_worker(detector_factory: Callable[[], IDetector]):
+    global _worker_scanner
+    _worker_scanner = VideoScanner(detector_factory())
+
+def _scan_in_worker(video_path: str) -> Tuple[str, dict]:
+    return video_path, _worker_scanner.scan_video(video_path)
+
+def _scan_fingerprint() -> str:
+    """
+    Returns a string identifying the settings a scan verdict depends on.
+    Cached verdicts recorded under different settings are not reused.
+    """
+    return json.dumps([
+        settings.YOLO_MODEL_NAME, settings.CONFIDENCE_THRESHOLD, settings.TARGET_CLASS_ID,
+        settings.DETECT_RESOLUTION, settings.SCAN_FRAME_STRIDE, settings.MIN_TRACK_DURATION_SEC,
+        settings.SINGLE_COW_CONFIDENCE_FRAMES, settings.SINGLE_COW_MAX_SCAN_FRAMES,
+    ])
+
 class VideoScanner:
-    def __init__(self, detector: IDetector):
+    def __init__(self, detector: Optional[IDetector], cache_path: Optional[str] = None,
+                 workers: int = 1, detector_factory: Optional[Callable[[], IDetector]] = None):
+        """
+        cache_path: Optional JSON file where scan verdicts are persisted between runs.
+                    Videos whose mtime and size are unchanged are not scanned again,
+                    as long as the detection/scan settings are the same as when they were scanned.
+        workers: Number of worker processes. With more than 1, each worker builds its own detector
+                 via `detector_factory` (default: YoloCowDetector) and `detector` may be None.
+        """
         self.detector = detector
         self.single_cow_dir = settings.SINGLE_COW_VIDEOS_DIR
+        self.cache_path = cache_path
+        self.workers = workers
+        self.detector_factory = detector_factory or default_detector_factory
+        # Videos found by the last scan_and_filter() call to contain no cows at all (see scan_video)
+        self.cow_free_videos = []
         os.makedirs(self.single_cow_dir, exist_ok=True)
 
+    def _load_cache(self) -> Dict[str, dict]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            logger.debug(f"Loaded {len(cache)} cached scan results from {self.cache_path}")
+            return cache if isinstance(cache, dict) else {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable scan cache {self.cache_path}: {e}")
+            return {}
+
+    def _save_cache(self, cache: Dict[str, dict]):
+        if not self.cache_path:
+            return
+        # Write to a temp file and swap it in so an interrupted run never leaves a truncated cache
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Failed to write scan cache {self.cache_path}: {e}")
+
+    def _count_cows(self, frames: List[np.ndarray]) -> List[int]:
+        """
+        Runs the detector on a batch of frames and returns the number of cows found in each.
+        Tracking IDs are not needed here, so every detected box counts.
+        """
+        counts = []
+        for res in self.detector.detect_batch(frames):
+            if res is not None and res.boxes is not None:
+                counts.append(len(res.boxes))
+            else:
+                counts.append(0)
+        return counts
+
     def is_single_cow_video(self, video_path: str) -> bool:
+        return self.scan_video(video_path)['single_cow']
+
+    def scan_video(self, video_path: str) -> dict:
         """
-        Determines if a video contains exactly one unique cow track throughout its duration.
+        Scans a video and returns its verdict as {'single_cow': bool, 'cow_free': bool}.
+
+        'cow_free' is True only if the whole video was sampled, no cow was seen, and the sampling stride
+        is shorter than MIN_TRACK_DURATION_SEC: any cow visible long enough to produce an output video
+        would have been detected, so processing the video cannot produce output and can be skipped.
+
+        'single_cow' determines if a video contains exactly one unique cow track throughout its duration.
         Logic: 
         - If multiple cows appear simultaneously in any frame -> False.
         - If we see more than 1 unique track ID over the whole video -> False (conservative approach).
@@ -28,85 +114,179 @@ class VideoScanner:
           If track ID switches, it's still 1 cow on screen, just re-identified.
           So: Max simultaneous cows <= 1 AND Total frames with cows > 0.
         """
-        cap = cv2.VideoCapture(video_path)
+        cap = open_video(video_path)
         if not cap.isOpened():
             logger.error(f"Error opening video for scanning: {video_path}")
-            return False
+            return {'single_cow': False, 'cow_free': False}
 
         max_simultaneous_cows = 0
         frames_with_cows = 0
+        # Consecutive sampled frames with exactly one cow; a long enough streak ends the scan early
+        single_streak = 0
+        confidence_frames = settings.SINGLE_COW_CONFIDENCE_FRAMES
+        max_scan_frames = settings.SINGLE_COW_MAX_SCAN_FRAMES
+        confident = False
         
-        # We can implement a frame skip to speed up scanning if needed, 
-        # but for accuracy (finding 2 cows showing up briefly), scanning every frame is safer.
-        # Given 105 videos, this might take a while.
-        # Let's frame skip = 5 (check every 5th frame) to speed up. 
-        # If a second cow appears for < 5 frames (<0.2s), it might be missed, but that's a reasonable trade-off.
+        # Classification does not need every frame: only every SCAN_FRAME_STRIDE-th frame is decoded
+        # and checked (15 frames ~ 0.5s at 30 fps). Frames in between are only grabbed, never retrieved.
+        # Seeking with CAP_PROP_POS_FRAMES is avoided: it is slow and can land on the wrong frame for H.264.
+        # If a second cow appears for less than one stride it might be missed, but that's a reasonable trade-off.
         
         frame_idx = 0
-        skip_frames = 5
+        skip_frames = max(1, settings.SCAN_FRAME_STRIDE)
+        reached_end = False
+        # Sampled frames are sent to the detector in batches to amortize per-call inference overhead
+        batch_size = max(1, settings.SCAN_BATCH_SIZE)
+        batch = []
         
         while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
+            # grab() only demuxes/decodes; the BGR conversion and copy happen in retrieve(),
+            # which is called for sampled frames only
+            if max_scan_frames is not None and frame_idx >= max_scan_frames:
+                ret = False
+            else:
+                ret = cap.grab()
+                # Only the decoder running out of frames means the whole video was sampled;
+                # a failed retrieve() below ends the scan without that guarantee
+                reached_end = not ret
+            if ret:
+                if frame_idx % skip_frames == 0:
+                    ret, frame = cap.retrieve()
+                    if ret:
+                        # Only counts are needed, so the downscaled detection frame is enough
+                        batch.append(resize_for_detection(frame)[0])
+                frame_idx += 1
             
-            if frame_idx % skip_frames == 0:
-                results = self.detector.detect_and_track(frame)
-                
-                cow_count = 0
-                if results and len(results) > 0:
-                    res = results[0]
-                    if res.boxes is not None and res.boxes.id is not None:
-                        # Count valid boxes
-                        cow_count = len(res.boxes)
+            if batch and (len(batch) >= batch_size or not ret):
+                for cow_count in self._count_cows(batch):
+                    if cow_count > max_simultaneous_cows:
+                        max_simultaneous_cows = cow_count
+                    
+                    if cow_count > 0:
+                        frames_with_cows += 1
+                    
+                    single_streak = single_streak + 1 if cow_count == 1 else 0
+                    if confidence_frames is not None and single_streak >= confidence_frames:
+                        confident = True
+                batch = []
                 
-                if cow_count > max_simultaneous_cows:
-                    max_simultaneous_cows = cow_count
-                
-                if cow_count > 0:
-                    frames_with_cows += 1
-                
-                # Early exit if we already found multiple cows
-                if max_simultaneous_cows > 1:
+                # Early exit if we already found multiple cows, or if one cow has been seen alone long enough
+                if max_simultaneous_cows > 1 or confident:
                     break
 
-            frame_idx += 1
+            if not ret:
+                break
 
+        fps = cap.get(cv2.CAP_PROP_FPS)
         cap.release()
 
+        if fps <= 0 or np.isnan(fps):
+            fps = 30.0
+        dense_enough = skip_frames <= fps * settings.MIN_TRACK_DURATION_SEC
+
         # Logic for "Single Cow Video"
         # Must have seen at least one cow, and never more than one at a time.
-        return max_simultaneous_cows == 1
+        return {
+            'single_cow': max_simultaneous_cows == 1,
+            'cow_free': reached_end and max_simultaneous_cows == 0 and dense_enough,
+        }
+
+    def _iter_scan_results(self, video_files: List[str]) -> Iterator[Tuple[str, dict]]:
+        """
+        Yields (video_path, verdict) for every video, where verdict is the scan_video() result.
+        Videos are independent, so with workers > 1 they are scanned in separate processes (in completion order).
+        """
+        if self.workers <= 1 or len(video_files) <= 1:
+            if video_files and self.detector is None:
+                # Parallel setups don't load a detector in the parent; build one for the in-process path
+                self.detector = self.detector_factory()
+            for video_path in video_files:
+                yield video_path, self.scan_video(video_path)
+            return
+
+        pool = create_process_pool(min(self.workers, len(video_files)), _init_scan_worker, (self.detector_factory,))
+        try:
+            futures = [pool.submit(_scan_in_worker, video_path) for video_path in video_files]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            # Don't start queued videos if we stop early (error or Ctrl+C)
+            pool.shutdown(wait=True, cancel_futures=True)
 
     def scan_and_filter(self, video_files: List[str]) -> List[str]:
         """
         Scans videos. If single cow, copy to SINGLE_COW_VIDEOS_DIR and return as 'processed'.
         Returns a list of video paths that were identified as single-cow and processed.
+        Videos that contain no cows at all are collected in self.cow_free_videos.
         """
         logger.info(f"Starting scan of {len(video_files)} videos for single-cow filter...")
         single_cow_videos = []
+        self.cow_free_videos = []
+        cache = self._load_cache()
 
-        # Create progress bar for scanning
-        pbar = tqdm(video_files, desc="Scanning videos", unit="video")
-        
-        for video_path in pbar:
-            pbar.set_description(f"Scanning {os.path.basename(video_path)[:30]}")
-            if self.is_single_cow_video(video_path):
-                logger.info(f"Single cow video identified: {os.path.basename(video_path)}")
-                
-                # Copy original file to separate folder
-                filename = os.path.basename(video_path)
-                dest_path = os.path.join(self.single_cow_dir, filename)
-                
-                try:
-                    shutil.copy2(video_path, dest_path)
-                    single_cow_videos.append(video_path)
-                    logger.debug(f"Copied to: {dest_path}")
-                except OSError as e:
-                    logger.error(f"Failed to copy {video_path}: {e}")
+        # Cache entries are keyed by absolute path and invalidated by mtime/size or settings changes
+        fingerprint = _scan_fingerprint()
+        file_stats = {}
+        cached_results = []
+        videos_to_scan = []
+        for video_path in video_files:
+            st = os.stat(video_path)
+            file_stats[video_path] = (st.st_mtime_ns, st.st_size)
+            entry = cache.get(os.path.abspath(video_path))
+            if (entry and entry.get('mtime_ns') == st.st_mtime_ns and entry.get('size') == st.st_size
+                    and entry.get('settings') == fingerprint):
+                cached_results.append((video_path, {'single_cow': entry['single_cow'],
+                                                    'cow_free': entry['cow_free']}))
             else:
-                logger.debug(f"Multi/No cow video: {os.path.basename(video_path)}")
+                videos_to_scan.append(video_path)
+
+        if cached_results:
+            logger.info(f"Reusing cached scan results for {len(cached_results)} unchanged videos.")
+
+        # Create progress bar for scanning
+        pbar = tqdm(total=len(video_files), desc="Scanning videos", unit="video")
         
-        pbar.close()
+        try:
+            for from_cache, results in ((True, cached_results), (False, self._iter_scan_results(videos_to_scan))):
+                for video_path, verdict in results:
+                    is_single = verdict['single_cow']
+                    filename = os.path.basename(video_path)
+                    pbar.set_description(f"Scanning {filename[:30]}")
+                    pbar.update(1)
+                    dest_path = os.path.join(self.single_cow_dir, filename)
+                    cache_key = os.path.abspath(video_path)
+
+                    if from_cache:
+                        # Only copy again if the previous copy went missing
+                        needs_copy = is_single and not os.path.exists(dest_path)
+                    else:
+                        mtime_ns, size = file_stats[video_path]
+                        cache[cache_key] = {'mtime_ns': mtime_ns, 'size': size, 'settings': fingerprint, **verdict}
+                        needs_copy = is_single
+
+                    if is_single:
+                        logger.info(f"Single cow video identified: {filename}")
+                        
+                        # Copy original file to separate folder
+                        if needs_copy:
+                            try:
+                                shutil.copy2(video_path, dest_path)
+                                logger.debug(f"Copied to: {dest_path}")
+                            except OSError as e:
+                                logger.error(f"Failed to copy {video_path}: {e}")
+                                # Forget the verdict so the copy is retried next run
+                                cache.pop(cache_key, None)
+                                continue
+                        single_cow_videos.append(video_path)
+                    elif verdict['cow_free']:
+                        logger.debug(f"No cow video: {filename}")
+                        self.cow_free_videos.append(video_path)
+                    else:
+                        logger.debug(f"Multi/No cow video: {filename}")
+        finally:
+            # Persist whatever was scanned, even if the run is interrupted
+            pbar.close()
+            self._save_cache(cache)
+
         logger.info(f"Scan complete. Found {len(single_cow_videos)} single-cow videos.")
         return single_cow_videos
@@ -1,7 +1,14 @@
+import logging
 import numpy as np
 import config.settings as settings
+from src import kernels
+
+logger = logging.getLogger(__name__)
 
 class BoxSmoother:
+    # Initial number of track rows; the array doubles when it runs out
+    _INITIAL_CAPACITY = 16
+
     def __init__(self, alpha: float = None):
         """
         alpha: Smoothing factor between 0 and 1.
@@ -10,26 +17,99 @@ class BoxSmoother:
                Default is settings.SMOOTHING_ALPHA.
         """
         self.alpha = alpha if alpha is not None else settings.SMOOTHING_ALPHA
-        self.tracks = {} # track_id -> [x1, y1, x2, y2] (float)
+        # All track state in one contiguous block, one [x1, y1, x2, y2, track_id] row per track.
+        # The id column is -1 for unused rows.
+        self._rows = np.full((self._INITIAL_CAPACITY, 5), -1.0)
+        self._id_to_row = {} # track_id -> row index in self._rows
+        # Holds alpha * box in update(), so the single-track path allocates no arrays
+        self._scratch = np.empty(4, dtype=float)
+
+        self._use_numba = settings.SMOOTHING_BACKEND == 'numba'
+        if self._use_numba and not kernels.NUMBA_AVAILABLE:
+            logger.warning("SMOOTHING_BACKEND is 'numba' but numba is not installed; using NumPy smoothing")
+            self._use_numba = False
+
+    @property
+    def alpha(self) -> float:
+        return self._alpha
+
+    @alpha.setter
+    def alpha(self, value: float):
+        # (alpha, 1 - alpha) are computed once here instead of on every update
+        self._alpha = float(value)
+        self._one_minus_alpha = 1.0 - self._alpha
+
+    def _reserve(self, needed: int):
+        """
+        Grows self._rows (doubling) so it holds at least `needed` rows.
+        """
+        if needed > len(self._rows):
+            capacity = len(self._rows)
+            while capacity < needed:
+                capacity *= 2
+            rows = np.full((capacity, 5), -1.0)
+            rows[:len(self._rows)] = self._rows
+            self._rows = rows
+
+    def _row_indices(self, track_ids) -> tuple:
+        """
+        Maps track IDs to row indices, assigning rows to unseen IDs.
+        Returns (indices, is_new) arrays.
+        """
+        id_to_row = self._id_to_row
+        is_new = np.fromiter((track_id not in id_to_row for track_id in track_ids), dtype=bool, count=len(track_ids))
+        if is_new.any():
+            self._reserve(len(id_to_row) + int(is_new.sum()))
+            for track_id, new in zip(track_ids, is_new):
+                if new:
+                    self._rows[len(id_to_row), 4] = track_id
+                    id_to_row[track_id] = len(id_to_row)
+        indices = np.fromiter((id_to_row[track_id] for track_id in track_ids), dtype=np.intp, count=len(track_ids))
+        return indices, is_new
+
+    def update_batch(self, track_ids, boxes) -> np.ndarray:
+        """
+        Updates the smoothed boxes of several tracks at once.
+        `track_ids` must not contain duplicates (one observation per track per frame).
+        Returns the smoothed boxes as an (N, 4) integer array, in the order of `track_ids`.
+        """
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        indices, is_new = self._row_indices(track_ids)
+
+        if self._use_numba:
+            # Fused in-place update, no temporaries
+            kernels.ema_rows(self._rows, indices, boxes, is_new, self._alpha)
+            return self._rows[indices, :4].astype(int)
+
+        # EMA formula: smoothed = alpha * new + (1 - alpha) * old
+        # First observations initialize the track with the box itself
+        smoothed = self._alpha * boxes + self._one_minus_alpha * self._rows[indices, :4]
+        smoothed[is_new] = boxes[is_new]
+        self._rows[indices, :4] = smoothed
+
+        return smoothed.astype(int)
 
     def update(self, track_id: int, box: list) -> list:
         """
         Update the smoothed box for the given track_id with the new observation `box`.
         Returns the smoothed box as [x1, y1, x2, y2] (integers).
         """
-        current_box = np.array(box, dtype=float)
-        
-        if track_id not in self.tracks:
-            # First observation, initialize
-            self.tracks[track_id] = current_box
-            smoothed_box = current_box
-        else:
-            # EMA formula: smoothed = alpha * new + (1 - alpha) * old
-            prev_box = self.tracks[track_id]
-            smoothed_box = self.alpha * current_box + (1 - self.alpha) * prev_box
-            self.tracks[track_id] = smoothed_box
-            
-        return smoothed_box.astype(int).tolist()
+        # Single-track fast path: works on one row directly, without the batch index arrays
+        row_index = self._id_to_row.get(track_id)
+        if row_index is None:
+            # First observation: store it and return the box itself, no index arrays or scratch needed
+            row_index = len(self._id_to_row)
+            self._reserve(row_index + 1)
+            self._id_to_row[track_id] = row_index
+            self._rows[row_index, :4] = box
+            self._rows[row_index, 4] = track_id
+            return [int(v) for v in box]
+        row = self._rows[row_index, :4]
+        row *= self._one_minus_alpha
+        row += np.multiply(box, self._alpha, out=self._scratch)
+        return [int(v) for v in row]
 
     def reset(self):
-        self.tracks.clear()
+        self._id_to_row.clear()
+        # One sweep over the id column frees every row
+        self._rows[:, 4] = -1
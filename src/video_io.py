@@ -0,0 +1,20 @@
+"""
+Input file helpers. main.py imports this module eagerly, so it must not import cv2 or numpy
+(decoding helpers live in src.capture).
+"""
+import os
+from typing import List
+import config.settings as settings
+
+def list_videos(directory: str) -> List[str]:
+    """
+    Returns the paths of all video files directly inside `directory`.
+    A file counts as a video when its lowercased extension is in settings.VIDEO_EXTS.
+    Symlinks to video files are included, like glob does (datasets are often linked into the input directory).
+    """
+    video_exts = settings.VIDEO_EXTS
+    with os.scandir(directory) as it:
+        return [
+            entry.path for entry in it
+            if entry.is_file() and os.path.splitext(entry.name)[1].lower() in video_exts
+        ]
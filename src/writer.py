@@ -1,93 +1,435 @@
 import cv2
 import os
-import shutil
+import math
+import queue
+import itertools
+import subprocess
+from pathlib import Path
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
+from typing import Optional, Tuple
 from src.interfaces import IWriterManager
 import config.settings as settings
 
 logger = logging.getLogger(__name__)
 
+# Threads used to finalize (release + rename) finished track videos in close_all().
+# The pool is shared by all CowVideoWriterManager instances in the process.
+_FINALIZE_WORKERS = 4
+_IO_POOL = ThreadPoolExecutor(max_workers=_FINALIZE_WORKERS, thread_name_prefix="writer-io")
+# Attempts for a rename/remove that fails with a transient OSError (e.g. a file briefly locked on Windows)
+_IO_ATTEMPTS = 3
+
+def _retry_io(func, *args):
+    """
+    Calls func(*args), retrying transient OSErrors with exponential backoff (1s, 2s, ...).
+    FileNotFoundError is not transient and is raised immediately, as is the last failure.
+    """
+    for attempt in range(_IO_ATTEMPTS):
+        try:
+            return func(*args)
+        except FileNotFoundError:
+            raise
+        except OSError as e:
+            if attempt == _IO_ATTEMPTS - 1:
+                raise
+            logger.debug(f"{func.__name__}{args} failed ({e}), retrying")
+            time.sleep(2 ** attempt)
+
+def _min_track_frames(min_duration: float, fps: float) -> int:
+    """
+    Smallest frame count n with n / fps >= min_duration, evaluated exactly like that float comparison.
+    A plain ceil(min_duration * fps) can be off by one from rounding (1.1 s * 50 fps -> 56 instead of 55).
+    """
+    n = max(0, math.ceil(min_duration * fps))
+    while n > 0 and (n - 1) / fps >= min_duration:
+        n -= 1
+    while n / fps < min_duration:
+        n += 1
+    return n
+
 class TrackInfo:
     def __init__(self, writer, temp_path, fps):
         self.writer = writer
         self.temp_path = temp_path
         self.fps = fps
         self.frame_count = 0
+        # (height, width) every frame of this track must have
+        self.frame_hw = None
+        # Frames collected until a full batch is handed to the writer thread.
+        # Before the writer exists this also holds the track's first frames (see write_frame).
+        self.pending = []
+        # Frames needed to reach MIN_TRACK_DURATION_SEC; shorter tracks are discarded.
+        # The writer is started once the track has this many frames (or earlier, see write_frame).
+        self.min_frames = _min_track_frames(settings.MIN_TRACK_DURATION_SEC, fps)
+        # Frame batches waiting to be encoded by this track's writer thread (None = stop).
+        # Capacity is WRITER_QUEUE_SIZE frames, rounded up to whole batches.
+        batch = max(1, settings.WRITER_BATCH)
+        self.queue = queue.Queue(maxsize=max(1, -(-settings.WRITER_QUEUE_SIZE // batch)))
+        self.thread = None
+        self.error = None
+
+# ffmpeg output codec options per settings.ENCODER (everything except 'mp4v')
+_FFMPEG_CODEC_ARGS = {
+    'nvenc': ['-c:v', 'h264_nvenc', '-preset', 'p1', '-tune', 'll'],
+    'qsv': ['-c:v', 'h264_qsv'],
+    'x264': ['-c:v', 'libx264', '-preset', 'veryfast'],
+}
+
+class _FfmpegWriter:
+    """
+    cv2.VideoWriter-like writer (write/release) that pipes raw BGR frames to an ffmpeg process,
+    so encoding can use hardware encoders (NVENC, Quick Sync) or libx264.
+    """
+    def __init__(self, path: str, encoder: str, fps: float, frame_size: Tuple[int, int]):
+        width, height = frame_size
+        cmd = [
+            settings.FFMPEG_BINARY, '-loglevel', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f"{width}x{height}", '-r', str(fps), '-i', '-',
+            *_FFMPEG_CODEC_ARGS[encoder], '-pix_fmt', 'yuv420p', path
+        ]
+        self.path = path
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, bufsize=0)
+
+    def write(self, frame: np.ndarray):
+        # Hand the array's own buffer to the pipe instead of copying it into a bytes object
+        if not frame.flags['C_CONTIGUOUS']:
+            frame = np.ascontiguousarray(frame)
+        view = memoryview(frame).cast('B')
+        # stdin is unbuffered, so a write may be partial
+        while view:
+            written = self.proc.stdin.write(view)
+            view = view[written:]
+
+    def release(self):
+        if self.proc.stdin.closed:
+            return
+        try:
+            self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        if self.proc.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.proc.returncode} while writing {self.path}")
+
+class FramePool:
+    """
+    Thread-safe pool of reusable (H, W, 3) uint8 frame buffers, keyed by shape.
+    Buffers are handed out by acquire() and come back via release() once encoded,
+    so steady-state writing allocates no new frames.
+    """
+    # Free buffers kept per shape; more are simply dropped
+    MAX_FREE_PER_SHAPE = 64
+
+    def __init__(self):
+        self._free = {} # (h, w) -> [np.ndarray]
+        self._lock = threading.Lock()
+
+    def acquire(self, height: int, width: int) -> np.ndarray:
+        with self._lock:
+            free = self._free.get((height, width))
+            if free:
+                return free.pop()
+        return np.empty((height, width, 3), dtype=np.uint8)
+
+    def release(self, frame: np.ndarray):
+        with self._lock:
+            free = self._free.setdefault(frame.shape[:2], [])
+            if len(free) < self.MAX_FREE_PER_SHAPE:
+                free.append(frame)
+
+def _encode_frames(track_info: TrackInfo, frame_pool: FramePool, inflight: threading.Semaphore):
+    """
+    Writer thread body: encodes queued frame batches until the None sentinel, returning each buffer to the pool
+    and its slot in the shared in-flight budget.
+    After an error it keeps draining the queue so the producer never blocks on a dead writer.
+    """
+    while True:
+        frames = track_info.queue.get()
+        if frames is None:
+            break
+        write = track_info.writer.write
+        for frame in frames:
+            if track_info.error is None:
+                try:
+                    write(frame)
+                except Exception as e:
+                    track_info.error = e
+            frame_pool.release(frame)
+            inflight.release()
 
 class CowVideoWriterManager(IWriterManager):
-    def __init__(self, output_dir: str):
+    def __init__(self, output_dir: str, frame_size: Optional[Tuple[int, int]] = None):
+        """
+        frame_size: Optional (width, height) of every written frame (e.g. settings.OUTPUT_RESOLUTION).
+                    When given, all writers are opened with it; otherwise each track uses the size
+                    of its first frame. Frames of any other size are rejected.
+        """
+        if frame_size is not None and (len(frame_size) != 2 or min(frame_size) <= 0):
+            raise ValueError(f"frame_size must be a positive (width, height), got {frame_size}")
         self.output_dir = output_dir
+        self._out = Path(output_dir)
+        self.frame_size = tuple(frame_size) if frame_size is not None else None
         self.global_cow_counter = 0 
         self.current_source_stem = "unknown"
         # Using a dictionary to store info about active tracks
         # track_id -> TrackInfo
         self.current_video_writers = {} 
+        # Tracks whose writer hasn't started yet, oldest first, and the number of frames they hold
+        # (bounded by settings.WRITER_MAX_PREBUFFER_FRAMES across all tracks)
+        self._prebuffering = {}
+        self._prebuffered_frames = 0
+        # Reusable output frame buffers shared by all writer threads
+        self._frame_pool = FramePool()
+        # Global budget of frames queued for encoding across all tracks (see settings.WRITER_MAX_INFLIGHT)
+        self._inflight = threading.Semaphore(settings.WRITER_MAX_INFLIGHT)
+        # Pooled buffers currently handed out by acquire_frame(), keyed by id()
+        # (holding the reference keeps the id from being reused by another array)
+        self._acquired = {}
+        # Temp file names only need to be unique among the processes writing to output_dir:
+        # PID + per-manager sequence number, no entropy needed
+        self._pid = os.getpid()
+        self._temp_seq = itertools.count()
         
         # Ensure output dir exists
         os.makedirs(self.output_dir, exist_ok=True)
     
-    def get_next_filename(self) -> str:
+    @property
+    def current_source_stem(self) -> str:
+        return self._source_stem
+
+    @current_source_stem.setter
+    def current_source_stem(self, value: str):
+        # Only the counter changes between files of one source, so the name template is built once here
+        self._source_stem = value
+        escaped = value.replace('{', '{{').replace('}', '}}')
+        self._name_fmt = f"{escaped}_cow_{{:04d}}{settings.VIDEO_EXT}"
+
+    def get_next_filename(self) -> Path:
         self.global_cow_counter += 1
         # New format: {source_stem}_cow_{counter}.mp4
-        filename = f"{self.current_source_stem}_cow_{self.global_cow_counter:04d}{settings.VIDEO_EXT}"
-        return os.path.join(self.output_dir, filename)
+        return self._out / self._name_fmt.format(self.global_cow_counter)
 
-    def write_frame(self, track_id: int, frame: np.ndarray, fps: float):
-        height, width = frame.shape[:2]
+    def _start_writer(self, track_id: int, track_info: TrackInfo):
+        """
+        Opens the track's VideoWriter (temp name in output dir) and starts its writer thread.
+        """
+        height, width = track_info.frame_hw
+        temp_filename = f"temp_{track_id}_{self._pid}_{next(self._temp_seq):08x}{settings.VIDEO_EXT}"
+        track_info.temp_path = self._out / temp_filename
         
-        if track_id not in self.current_video_writers:
-            # Create new writer with temp name in output dir
-            temp_filename = f"temp_{track_id}_{os.urandom(4).hex()}{settings.VIDEO_EXT}"
-            output_path = os.path.join(self.output_dir, temp_filename)
-            
-            # Use provided fps
-            if fps <= 0:
-                fps = 30.0 # Fallback
-                
+        encoder = settings.ENCODER
+        if encoder == 'mp4v':
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+            track_info.writer = cv2.VideoWriter(os.fspath(track_info.temp_path), fourcc, track_info.fps, (width, height))
+        else:
+            track_info.writer = _FfmpegWriter(os.fspath(track_info.temp_path), encoder, track_info.fps, (width, height))
+        track_info.thread = threading.Thread(target=_encode_frames, args=(track_info, self._frame_pool, self._inflight), daemon=True)
+        track_info.thread.start()
+
+    def write_frame(self, track_id: int, frame: np.ndarray, fps: float):
+        track_info = self.current_video_writers.get(track_id)
+        if track_info is None:
+            width, height = self.frame_size or (frame.shape[1], frame.shape[0])
             
-            self.current_video_writers[track_id] = TrackInfo(writer, output_path, fps)
+            # Containers get an integer frame rate: fractional rates like 240.373 produced malformed
+            # mp4 headers. The processor already rounds, this guards other callers.
+            fps = max(1, int(round(fps))) if fps > 0 else 30 # Fallback
+            
+            # The writer is created lazily, once the track is long enough to be kept
+            track_info = TrackInfo(None, None, fps)
+            track_info.frame_hw = (height, width)
+            self.current_video_writers[track_id] = track_info
+            self._prebuffering[track_id] = track_info
+        
+        # Buffers from acquire_frame() are handed back here, whether or not the frame is accepted
+        acquired = self._acquired.pop(id(frame), None) is frame
         
-        track_info = self.current_video_writers[track_id]
-        track_info.writer.write(frame)
+        # cv2.VideoWriter silently drops frames of the wrong size, so catch mismatches here.
+        # Frames are pre-sized to frame_hw by the processor, so the check is compiled out under `python -O`.
+        if __debug__ and frame.shape[:2] != track_info.frame_hw:
+            if acquired:
+                self._frame_pool.release(frame)
+            raise ValueError(f"Frame size {frame.shape[1]}x{frame.shape[0]} for track {track_id} does not match "
+                             f"the writer size {track_info.frame_hw[1]}x{track_info.frame_hw[0]}")
+        
+        # Encoding happens on the track's writer thread; this only blocks when its queue is full.
+        # Buffers from acquire_frame() are queued as is; anything else is copied into a pooled
+        # buffer because callers may reuse it for the next frame.
+        if not acquired:
+            pooled = self._frame_pool.acquire(*track_info.frame_hw)
+            np.copyto(pooled, frame)
+            frame = pooled
+        track_info.pending.append(frame)
         track_info.frame_count += 1
+        if track_info.writer is None:
+            self._prebuffered_frames += 1
+            if track_info.frame_count >= track_info.min_frames:
+                # Long enough: start encoding, beginning with the buffered frames
+                self._start_prebuffered(track_id)
+            # Over the global prebuffer budget: start the oldest waiting tracks early
+            # (one that still ends too short is deleted in close_all)
+            while self._prebuffering and self._prebuffered_frames > settings.WRITER_MAX_PREBUFFER_FRAMES:
+                self._start_prebuffered(next(iter(self._prebuffering)))
+        elif len(track_info.pending) >= settings.WRITER_BATCH:
+            self._flush(track_info)
+
+    def _start_prebuffered(self, track_id: int):
+        """
+        Starts the writer of a track that is still prebuffering and hands it the buffered frames.
+        """
+        track_info = self._prebuffering.pop(track_id)
+        self._prebuffered_frames -= len(track_info.pending)
+        self._start_writer(track_id, track_info)
+        self._flush(track_info)
+
+    def _flush(self, track_info: TrackInfo):
+        """
+        Hands the pending frames of a track to its writer thread, in batches of at most WRITER_BATCH.
+        Each batch first takes one in-flight slot per frame, blocking while the encoders are behind.
+        """
+        pending = track_info.pending
+        if not pending:
+            return
+        track_info.pending = []
+        batch_size = max(1, settings.WRITER_BATCH)
+        batches = [pending] if len(pending) <= batch_size else \
+            [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        for batch in batches:
+            for _ in range(len(batch)):
+                self._inflight.acquire()
+            track_info.queue.put(batch)
+
+    def acquire_frame(self, height: int, width: int) -> np.ndarray:
+        frame = self._frame_pool.acquire(height, width)
+        self._acquired[id(frame)] = frame
+        return frame
+
+    def _release_acquired(self):
+        """
+        Returns buffers from acquire_frame() that never reached write_frame() (the caller failed
+        between the two) to the pool.
+        """
+        for frame in self._acquired.values():
+            self._frame_pool.release(frame)
+        self._acquired.clear()
 
     def close_all(self):
-        # Iterate over all current writers
+        # Flush and stop all writer threads first so they finish their queued frames concurrently
+        started = {trk_id: info for trk_id, info in self.current_video_writers.items() if info.writer is not None}
+        for track_info in started.values():
+            self._flush(track_info)
+            track_info.queue.put(None)
+        for track_info in started.values():
+            track_info.thread.join()
+
+        # Tracks that never reached the start threshold are too short: nothing was encoded, just drop their frames
         for trk_id, track_info in self.current_video_writers.items():
-            track_info.writer.release()
-            
-            duration = track_info.frame_count / track_info.fps if track_info.fps > 0 else 0
-            
-            if duration >= settings.MIN_TRACK_DURATION_SEC:
-                # Sufficient duration, finalize the file
+            if track_info.writer is None:
+                duration = track_info.frame_count / track_info.fps
+                logger.debug(f"Discarding track {trk_id} - too short ({duration:.2f}s)")
+                for frame in track_info.pending:
+                    self._frame_pool.release(frame)
+        self._prebuffering.clear()
+        self._prebuffered_frames = 0
+        self._release_acquired()
+
+        # Releasing a writer (writing the container index) is independent per track
+        self._run_io(self._release_writer, list(started.values()))
+
+        # Assign final filenames up front, in track order, so naming stays deterministic;
+        # only complete tracks with sufficient duration advance the cow counter
+        items = []
+        for trk_id, track_info in started.items():
+            duration = track_info.frame_count / track_info.fps
+            if track_info.error is not None:
+                # The temp file may be truncated or corrupt: never save it as a result
+                logger.error(f"Discarding track {trk_id} - error writing frames: {track_info.error}")
+                final_path = None
+            elif track_info.frame_count >= track_info.min_frames:
                 final_path = self.get_next_filename()
-                
-                # If file exists, remove it (overwrite logic)
-                if os.path.exists(final_path):
-                    try:
-                        os.remove(final_path)
-                    except OSError:
-                        pass # Best effort
-                
-                try:
-                    shutil.move(track_info.temp_path, final_path)
-                    logger.info(f"Saved cow video: {os.path.basename(final_path)} (duration: {duration:.2f}s)")
-                except OSError as e:
-                    logger.error(f"Error renaming temp file {track_info.temp_path}: {e}")
             else:
-                # Too short, discard
                 logger.debug(f"Discarding track {trk_id} - too short ({duration:.2f}s)")
-                if os.path.exists(track_info.temp_path):
-                    try:
-                        os.remove(track_info.temp_path)
-                    except OSError as e:
-                        logger.warning(f"Failed to remove temp file {track_info.temp_path}: {e}")
+                final_path = None
+            items.append((track_info, duration, final_path))
+        
+        # Renames/removals run on the I/O pool; waits for all of them so the output directory
+        # is complete when close_all returns
+        self._run_io(lambda item: self._finalize_track(*item), items)
         
         self.current_video_writers.clear()
 
+    def abort(self):
+        """
+        Discards every open track: writer threads stop without encoding their queued frames,
+        temp files are deleted and the cow counter is not advanced.
+        """
+        started = [info for info in self.current_video_writers.values() if info.writer is not None]
+        for track_info in self.current_video_writers.values():
+            for frame in track_info.pending:
+                self._frame_pool.release(frame)
+            track_info.pending = []
+        for track_info in started:
+            # A set error makes the writer thread only drain its queue (see _encode_frames)
+            if track_info.error is None:
+                track_info.error = RuntimeError("track aborted")
+            track_info.queue.put(None)
+        for track_info in started:
+            track_info.thread.join()
+        self._prebuffering.clear()
+        self._prebuffered_frames = 0
+        self._release_acquired()
+
+        self._run_io(self._release_writer, started)
+        self._run_io(lambda track_info: self._finalize_track(track_info, 0.0, None), started)
+        self.current_video_writers.clear()
+
+    @staticmethod
+    def _run_io(func, items: list):
+        """
+        Calls func(item) for every item, on the shared I/O pool when there is more than one.
+        """
+        if len(items) > 1:
+            list(_IO_POOL.map(func, items))
+        else:
+            for item in items:
+                func(item)
+
+    @staticmethod
+    def _release_writer(track_info: TrackInfo):
+        """
+        Releases a track's writer. A failure is recorded in track_info.error like a write error.
+        """
+        try:
+            track_info.writer.release()
+        except Exception as e:
+            if track_info.error is None:
+                track_info.error = e
+
+    @staticmethod
+    def _finalize_track(track_info: TrackInfo, duration: float, final_path: Optional[Path]):
+        """
+        Renames a track's released temp file to `final_path`,
+        or deletes it when `final_path` is None (track too short or failed).
+        """
+        if final_path is not None:
+            # Sufficient duration, finalize the file.
+            # Temp file lives in the same directory: a single atomic rename, overwriting any existing file
+            try:
+                _retry_io(os.replace, track_info.temp_path, final_path)
+                logger.info(f"Saved cow video: {final_path.name} (duration: {duration:.2f}s)")
+            except OSError as e:
+                logger.error(f"Error renaming temp file {track_info.temp_path}: {e}")
+        else:
+            try:
+                _retry_io(os.remove, track_info.temp_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to remove temp file {track_info.temp_path}: {e}")
+
     def reset_track_mapping(self, source_stem: str = None):
         """Call this between source videos."""
         self.close_all()
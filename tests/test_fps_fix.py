@@ -37,15 +37,17 @@ class TestFpsFix(unittest.TestCase):
             mock_cap_cls.return_value = mock_cap
             
             # Mock detector to find a cow so write_frame is called
+            # (inside the frame, away from the border filter)
             class DummyResult:
                 def __init__(self):
                     self.boxes = self
-                    self.xyxy = MagicMock()
-                    self.xyxy.cpu().numpy().astype.return_value = [[0,0,50,50]]
-                    self.id = MagicMock()
-                    self.id.cpu().numpy().astype.return_value = [1]
+                    # Tracked rows: (x1, y1, x2, y2, track_id, conf, cls)
+                    self.data = MagicMock()
+                    self.data.cpu().numpy.return_value = np.array([[10, 10, 60, 60, 1, 0.9, 19]], dtype=np.float32)
+                    self.id = np.array([1])
+                    self.masks = None
             
-            mock_detector.detect_and_track.return_value = [DummyResult()]
+            mock_detector.detect_and_track_batch.side_effect = lambda frames: [DummyResult() for _ in frames]
             
             # Run
             processor.process_video("dummy_path.mp4")
@@ -0,0 +1,56 @@
+import unittest
+import numpy as np
+import os
+import sys
+import cv2
+from unittest.mock import MagicMock
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.processor import CowExtractionProcessor
+
+class TestCropMasks(unittest.TestCase):
+    """Masking only the crop region must give the same pixels as masking the full frame and cropping."""
+    def setUp(self):
+        self.processor = CowExtractionProcessor(MagicMock(), MagicMock())
+        self.rng = np.random.default_rng(0)
+        self.frame = self.rng.integers(0, 256, size=(240, 320, 3), dtype=np.uint8)
+
+    def _cases(self, count=200):
+        img_h, img_w = self.frame.shape[:2]
+        for _ in range(count):
+            # Polygon spread around a random center, so it often crosses the crop edges
+            n = self.rng.integers(3, 30)
+            cx, cy = self.rng.uniform(0, img_w), self.rng.uniform(0, img_h)
+            xs = np.clip(cx + self.rng.uniform(-150, 150, n), 0, img_w - 1)
+            ys = np.clip(cy + self.rng.uniform(-150, 150, n), 0, img_h - 1)
+            segment = np.stack([xs, ys], axis=1).astype(np.int32)
+            x1, y1 = int(self.rng.integers(0, img_w - 20)), int(self.rng.integers(0, img_h - 20))
+            x2, y2 = int(self.rng.integers(x1 + 1, img_w)), int(self.rng.integers(y1 + 1, img_h))
+            yield segment, x1, y1, x2, y2
+
+    def test_binary_mask_matches_full_frame(self):
+        for segment, x1, y1, x2, y2 in self._cases():
+            mask = np.zeros(self.frame.shape[:2], dtype=np.uint8)
+            cv2.fillPoly(mask, [segment], 1)
+            expected = cv2.bitwise_and(self.frame, self.frame, mask=mask)[y1:y2, x1:x2]
+
+            result = self.processor._apply_binary_mask(self.frame, segment, x1, y1, x2, y2)
+            np.testing.assert_array_equal(result, expected)
+
+    def test_soft_mask_matches_full_frame(self):
+        for segment, x1, y1, x2, y2 in self._cases():
+            mask = np.zeros(self.frame.shape[:2], dtype=np.uint8)
+            cv2.fillPoly(mask, [segment], 255)
+            mask = cv2.dilate(mask, np.ones((3, 3), np.uint8), iterations=self.processor._dilation_iterations)
+            mask = cv2.GaussianBlur(mask, self.processor._blur_size, 0)
+            alpha = mask[y1:y2, x1:x2].astype(np.float32) * np.float32(1.0 / 255.0)
+            crop = self.frame[y1:y2, x1:x2]
+            expected = cv2.blendLinear(crop, np.zeros_like(crop), alpha, 1.0 - alpha)
+
+            result = self.processor._apply_soft_mask(self.frame, segment, x1, y1, x2, y2)
+            np.testing.assert_array_equal(result, expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import _processed_source_stems
+
+class TestResumeStems(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output_dir)
+
+    def _stems(self, *names):
+        for name in names:
+            open(os.path.join(self.output_dir, name), 'w').close()
+        with os.scandir(self.output_dir) as it:
+            return _processed_source_stems(list(it), '.mp4')
+
+    def test_stem_is_split_on_last_marker(self):
+        stems = self._stems("barn_cow_cam1_cow_0001.mp4", "barn_cow_cam1_cow_0002.mp4", "field_cow_0001.mp4")
+        self.assertEqual(stems, {"barn_cow_cam1", "field"})
+
+    def test_other_files_are_ignored(self):
+        os.mkdir(os.path.join(self.output_dir, "dir_cow_0001.mp4"))
+        stems = self._stems("notes.txt", "clip_cow_0001.avi", "no_marker.mp4")
+        self.assertEqual(stems, set())
+
+if __name__ == '__main__':
+    unittest.main()
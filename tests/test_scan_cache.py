@@ -0,0 +1,89 @@
+import unittest
+import numpy as np
+import os
+import shutil
+import sys
+import tempfile
+import cv2
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.scanner import VideoScanner
+from src.interfaces import IDetector
+import config.settings as settings
+
+class DummyBoxes:
+    def __init__(self, count):
+        self.count = count
+        self.id = np.arange(count) if count else None
+
+    def __len__(self):
+        return self.count
+
+class DummyResult:
+    def __init__(self, count):
+        self.boxes = DummyBoxes(count)
+
+class CountingDetector(IDetector):
+    """Sees exactly one cow in every frame and counts how many frames it was asked about."""
+    def __init__(self):
+        self.calls = 0
+
+    def detect_and_track(self, frame):
+        self.calls += 1
+        return [DummyResult(1)]
+
+class TestScanCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self._saved = {name: getattr(settings, name) for name in ('SINGLE_COW_VIDEOS_DIR', 'SCAN_FRAME_STRIDE')}
+        settings.SINGLE_COW_VIDEOS_DIR = os.path.join(self.tmp_dir, 'single')
+
+        self.video_path = os.path.join(self.tmp_dir, 'cow.mp4')
+        writer = cv2.VideoWriter(self.video_path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (64, 64))
+        for i in range(60):
+            writer.write(np.full((64, 64, 3), i, dtype=np.uint8))
+        writer.release()
+
+        self.cache_path = os.path.join(self.tmp_dir, 'scan_cache.json')
+        self.detector = CountingDetector()
+        self.scanner = VideoScanner(self.detector, cache_path=self.cache_path)
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(settings, name, value)
+        shutil.rmtree(self.tmp_dir)
+
+    def _scan(self):
+        """Scans the test video and returns (single-cow result, number of detector calls)."""
+        calls_before = self.detector.calls
+        result = self.scanner.scan_and_filter([self.video_path])
+        return result, self.detector.calls - calls_before
+
+    def test_unchanged_video_is_served_from_cache(self):
+        result, calls = self._scan()
+        self.assertEqual(result, [self.video_path])
+        self.assertGreater(calls, 0)
+
+        result, calls = self._scan()
+        self.assertEqual(result, [self.video_path])
+        self.assertEqual(calls, 0, "Unchanged video should not be scanned again")
+
+    def test_modified_video_is_rescanned(self):
+        self._scan()
+        st = os.stat(self.video_path)
+        os.utime(self.video_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+        _, calls = self._scan()
+        self.assertGreater(calls, 0, "Changed mtime should invalidate the cache entry")
+
+    def test_settings_change_invalidates_cache(self):
+        self._scan()
+        settings.SCAN_FRAME_STRIDE = 5
+
+        _, calls = self._scan()
+        self.assertGreater(calls, 0, "Changed scan settings should invalidate the cache entry")
+
+if __name__ == '__main__':
+    unittest.main()
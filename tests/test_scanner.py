@@ -0,0 +1,123 @@
+import unittest
+import numpy as np
+import os
+import sys
+from unittest.mock import patch
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.scanner import VideoScanner
+from src.interfaces import IDetector
+import config.settings as settings
+
+class DummyResult:
+    def __init__(self, count):
+        self.boxes = [None] * count
+
+class CowCountDetector(IDetector):
+    """Reports a fixed number of cows in every frame and records how many frames it saw."""
+    def __init__(self, count):
+        self.count = count
+        self.frames_seen = 0
+
+    def detect_and_track(self, frame):
+        self.frames_seen += 1
+        return [DummyResult(self.count)]
+
+class FakeCapture:
+    """Minimal cv2.VideoCapture stand-in: `frame_count` frames at `fps`, optionally failing retrieve() at one index."""
+    def __init__(self, frame_count, fps=30.0, fail_retrieve_at=None):
+        self.frame_count = frame_count
+        self.fps = fps
+        self.fail_retrieve_at = fail_retrieve_at
+        self.position = 0
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        if self.position >= self.frame_count:
+            return False
+        self.position += 1
+        return True
+
+    def retrieve(self):
+        if self.position - 1 == self.fail_retrieve_at:
+            return False, None
+        return True, np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def get(self, prop):
+        return self.fps
+
+    def release(self):
+        pass
+
+class TestScanVerdicts(unittest.TestCase):
+    def setUp(self):
+        self._saved = {name: getattr(settings, name)
+                       for name in ('SCAN_FRAME_STRIDE', 'SCAN_BATCH_SIZE', 'MIN_TRACK_DURATION_SEC',
+                                    'SINGLE_COW_CONFIDENCE_FRAMES', 'SINGLE_COW_MAX_SCAN_FRAMES')}
+        # 30 fps and 1 s minimum track -> any stride up to 30 frames samples every long enough track
+        settings.SCAN_FRAME_STRIDE = 10
+        settings.SCAN_BATCH_SIZE = 4
+        settings.MIN_TRACK_DURATION_SEC = 1.0
+        settings.SINGLE_COW_CONFIDENCE_FRAMES = None
+        settings.SINGLE_COW_MAX_SCAN_FRAMES = None
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(settings, name, value)
+
+    def _scan(self, cap, detector):
+        with patch('src.scanner.open_video', return_value=cap):
+            return VideoScanner(detector).scan_video('video.mp4')
+
+    def test_fully_sampled_video_without_cows_is_cow_free(self):
+        verdict = self._scan(FakeCapture(300), CowCountDetector(0))
+        self.assertEqual(verdict, {'single_cow': False, 'cow_free': True})
+
+    def test_retrieve_failure_is_not_cow_free(self):
+        detector = CowCountDetector(0)
+        verdict = self._scan(FakeCapture(300, fail_retrieve_at=100), detector)
+        self.assertFalse(verdict['cow_free'], "A scan cut short by a decode error has not seen the whole video")
+        self.assertEqual(detector.frames_seen, 10)
+
+    def test_frame_limit_is_not_cow_free(self):
+        settings.SINGLE_COW_MAX_SCAN_FRAMES = 100
+        verdict = self._scan(FakeCapture(300), CowCountDetector(0))
+        self.assertFalse(verdict['cow_free'], "A scan stopped at SINGLE_COW_MAX_SCAN_FRAMES has not seen the whole video")
+
+    def test_frame_limit_past_the_end_is_cow_free(self):
+        settings.SINGLE_COW_MAX_SCAN_FRAMES = 400
+        verdict = self._scan(FakeCapture(300), CowCountDetector(0))
+        self.assertTrue(verdict['cow_free'])
+
+    def test_sparse_stride_is_not_cow_free(self):
+        settings.SCAN_FRAME_STRIDE = 31
+        verdict = self._scan(FakeCapture(300), CowCountDetector(0))
+        self.assertFalse(verdict['cow_free'], "A stride longer than MIN_TRACK_DURATION_SEC can miss a whole track")
+
+        settings.SCAN_FRAME_STRIDE = 30
+        verdict = self._scan(FakeCapture(300), CowCountDetector(0))
+        self.assertTrue(verdict['cow_free'])
+
+    def test_single_cow_streak_stops_scan_early(self):
+        settings.SINGLE_COW_CONFIDENCE_FRAMES = 5
+        cap = FakeCapture(300)
+        detector = CowCountDetector(1)
+        verdict = self._scan(cap, detector)
+        self.assertEqual(verdict, {'single_cow': True, 'cow_free': False})
+        # Stops after the batch that completes the streak (batches of 4 -> 8 of the 30 sampled frames)
+        self.assertEqual(detector.frames_seen, 8)
+        self.assertLess(cap.position, 300)
+
+    def test_streak_not_reached_scans_whole_video(self):
+        settings.SINGLE_COW_CONFIDENCE_FRAMES = 31
+        detector = CowCountDetector(1)
+        verdict = self._scan(FakeCapture(300), detector)
+        self.assertTrue(verdict['single_cow'])
+        self.assertEqual(detector.frames_seen, 30)
+
+if __name__ == '__main__':
+    unittest.main()
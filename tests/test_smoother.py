@@ -0,0 +1,39 @@
+import unittest
+import numpy as np
+import os
+import sys
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.smoother import BoxSmoother
+
+class TestBoxSmoother(unittest.TestCase):
+    def test_update_batch_matches_update(self):
+        rng = np.random.default_rng(0)
+        batch_smoother = BoxSmoother(alpha=0.3)
+        single_smoother = BoxSmoother(alpha=0.3)
+
+        # Tracks appear and disappear between frames; more tracks than the initial row capacity
+        for _ in range(100):
+            track_ids = rng.choice(40, size=rng.integers(1, 12), replace=False).tolist()
+            boxes = rng.uniform(0, 1000, size=(len(track_ids), 4))
+
+            batch_result = batch_smoother.update_batch(track_ids, boxes).tolist()
+            single_result = [single_smoother.update(track_id, box) for track_id, box in zip(track_ids, boxes)]
+            self.assertEqual(batch_result, single_result)
+
+    def test_first_observation_returns_box(self):
+        smoother = BoxSmoother(alpha=0.2)
+        self.assertEqual(smoother.update(7, [10, 20, 30, 40]), [10, 20, 30, 40])
+        self.assertEqual(smoother.update_batch([8], [[1, 2, 3, 4]]).tolist(), [[1, 2, 3, 4]])
+
+    def test_reset_forgets_tracks(self):
+        smoother = BoxSmoother(alpha=0.5)
+        smoother.update(1, [0, 0, 10, 10])
+        smoother.reset()
+        # After reset the same id starts over from its first observation
+        self.assertEqual(smoother.update(1, [100, 100, 200, 200]), [100, 100, 200, 200])
+
+if __name__ == '__main__':
+    unittest.main()
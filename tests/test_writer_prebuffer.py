@@ -0,0 +1,137 @@
+import unittest
+import numpy as np
+import os
+import shutil
+import sys
+import tempfile
+import cv2
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.writer import CowVideoWriterManager, _min_track_frames
+import config.settings as settings
+
+class TestWriterPrebuffer(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = tempfile.mkdtemp()
+        self._saved = {name: getattr(settings, name)
+                       for name in ('MIN_TRACK_DURATION_SEC', 'WRITER_MAX_PREBUFFER_FRAMES', 'VIDEO_EXT', 'ENCODER')}
+        # 30 fps -> 15 frames needed
+        settings.MIN_TRACK_DURATION_SEC = 0.5
+        settings.WRITER_MAX_PREBUFFER_FRAMES = 150
+        settings.VIDEO_EXT = '.mp4'
+        settings.ENCODER = 'mp4v'
+        self.manager = CowVideoWriterManager(self.output_dir, frame_size=(64, 48))
+        self.frame = np.zeros((48, 64, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        for name, value in self._saved.items():
+            setattr(settings, name, value)
+        shutil.rmtree(self.output_dir)
+
+    def _write(self, track_id, count):
+        for _ in range(count):
+            self.manager.write_frame(track_id, self.frame, 30)
+
+    def _frame_count(self, filename):
+        cap = cv2.VideoCapture(os.path.join(self.output_dir, filename))
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+        return count
+
+    def test_writer_starts_only_at_min_duration(self):
+        self._write(1, 14)
+        self.assertIsNone(self.manager.current_video_writers[1].writer)
+        self.assertEqual(os.listdir(self.output_dir), [], "No file should exist before the track is long enough")
+
+        self._write(1, 1)
+        self.assertIsNotNone(self.manager.current_video_writers[1].writer)
+
+        self.manager.close_all()
+        self.assertEqual(os.listdir(self.output_dir), ["unknown_cow_0001.mp4"])
+        self.assertEqual(self._frame_count("unknown_cow_0001.mp4"), 15)
+
+    def test_short_track_is_discarded_without_encoding(self):
+        self._write(1, 5)
+        self._write(2, 20)
+        self.assertIsNone(self.manager.current_video_writers[1].writer)
+
+        self.manager.close_all()
+        # Short track never got a writer or a counter value
+        self.assertEqual(os.listdir(self.output_dir), ["unknown_cow_0001.mp4"])
+        self.assertEqual(self._frame_count("unknown_cow_0001.mp4"), 20)
+
+    def test_prebuffer_budget_starts_oldest_track(self):
+        settings.WRITER_MAX_PREBUFFER_FRAMES = 10
+        # Interleaved like simultaneous cows: 6 + 5 frames exceed the budget of 10
+        for _ in range(5):
+            self._write(1, 1)
+            self._write(2, 1)
+        self._write(1, 1)
+
+        self.assertIsNotNone(self.manager.current_video_writers[1].writer, "Oldest track should start early")
+        self.assertIsNone(self.manager.current_video_writers[2].writer)
+        self.assertLessEqual(self.manager._prebuffered_frames, 10)
+
+        # Track 1 started early but still ends too short -> deleted; track 2 stays unencoded
+        self.manager.close_all()
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+    def test_negative_prebuffer_budget_starts_tracks_immediately(self):
+        settings.WRITER_MAX_PREBUFFER_FRAMES = -1
+        self._write(1, 1)
+        self.assertIsNotNone(self.manager.current_video_writers[1].writer)
+        self.assertEqual(self.manager._prebuffered_frames, 0)
+        self.manager.close_all()
+
+    def test_acquired_frames_are_not_leaked(self):
+        # Rejected by write_frame (wrong size): the buffer goes back to the pool right away
+        self._write(1, 1)
+        wrong = self.manager.acquire_frame(32, 32)
+        with self.assertRaises(ValueError):
+            self.manager.write_frame(1, wrong, 30)
+        self.assertEqual(self.manager._acquired, {})
+
+        # Never handed to write_frame (caller failed in between): released when the tracks are closed
+        self.manager.acquire_frame(48, 64)
+        self.manager.close_all()
+        self.assertEqual(self.manager._acquired, {})
+
+    def test_abort_discards_open_tracks(self):
+        self._write(1, 20)   # started
+        self._write(2, 5)    # still prebuffering
+        self.assertIsNotNone(self.manager.current_video_writers[1].writer)
+
+        self.manager.abort()
+        self.assertEqual(os.listdir(self.output_dir), [], "Aborted tracks should leave no temp or output files")
+        self.assertEqual(self.manager._prebuffered_frames, 0)
+
+        # A later reset (reused processor) must not save anything from the aborted video
+        self.manager.reset_track_mapping("next")
+        self.assertEqual(os.listdir(self.output_dir), [])
+
+class TestMinTrackFrames(unittest.TestCase):
+    def _check(self, min_duration, fps):
+        n = _min_track_frames(min_duration, fps)
+        # Same comparison close_all uses on the frame count: n frames are enough, n - 1 are not
+        self.assertGreaterEqual(n / fps, min_duration)
+        if n > 0:
+            self.assertLess((n - 1) / fps, min_duration)
+        return n
+
+    def test_integer_fps(self):
+        self.assertEqual(self._check(4.0, 30), 120)
+        self.assertEqual(self._check(0.5, 30), 15)
+        self.assertEqual(self._check(1.1, 50), 55)  # ceil(1.1 * 50) would give 56
+        self.assertEqual(self._check(0.0, 30), 0)
+
+    def test_fractional_fps(self):
+        self.assertEqual(self._check(4.0, 29.97), 120)
+        self.assertEqual(self._check(1.0, 23.976), 24)
+        for min_duration in (0.1, 0.3, 0.7, 1.1, 2.3, 4.0):
+            for fps in (7.5, 12.5, 23.976, 29.97, 59.94, 240.373):
+                self._check(min_duration, fps)
+
+if __name__ == '__main__':
+    unittest.main()
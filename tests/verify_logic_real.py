@@ -58,13 +58,13 @@ class TestCowExtractionReal(unittest.TestCase):
         files = os.listdir(self.output_dir)
         print(f"Output files: {files}")
         
-        # Expectation: Only 1 file "cow_0001.mp4"
+        # Expectation: Only 1 file "unknown_cow_0001.mp4" (no source stem set yet)
         # Track 1 discarded. Track 2 saved.
         self.assertEqual(len(files), 1, "Should have exactly 1 output file")
-        self.assertIn("cow_0001.mp4", files)
+        self.assertIn("unknown_cow_0001.mp4", files)
         
         # Verify duration of saved file?
-        cap = cv2.VideoCapture(os.path.join(self.output_dir, "cow_0001.mp4"))
+        cap = cv2.VideoCapture(os.path.join(self.output_dir, "unknown_cow_0001.mp4"))
         frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         print(f"Saved video has {frame_count} frames")
         cap.release()
@@ -77,8 +77,10 @@ class TestCowExtractionReal(unittest.TestCase):
         class DummyResult:
             def __init__(self, boxes, ids):
                 self.boxes = self
-                self.xyxy = MockTensor(boxes)
-                self.id = MockTensor(ids) if ids is not None else None
+                # Tracked rows: (x1, y1, x2, y2, track_id, conf, cls)
+                self.data = MockTensor([box + [track_id, 0.9, 19] for box, track_id in zip(boxes, ids)])
+                self.id = MockTensor(ids)
+                self.masks = None
         
         class MockTensor:
             def __init__(self, data):
@@ -90,8 +92,8 @@ class TestCowExtractionReal(unittest.TestCase):
         # Mock detect_and_track to return a box
         def side_effect(frame):
             # Return 1 cow
-            # Box: 0,0, 50,50 (50x50 size)
-            res = DummyResult([[0,0,50,50]], [1])
+            # Box: 10,10, 60,60 (50x50 size, clear of the border filter)
+            res = DummyResult([[10,10,60,60]], [1])
             return [res]
         
         detector.detect_and_track = side_effect